@@ -171,15 +171,15 @@ plt.show()
 
 # %%
 if jft.hmc._DEBUG_FLAG:
-    debug_pos = jnp.array(jft.hmc._DEBUG_STORE)[:, 0, :]
+    debug_pos = jnp.array([qp.position for qp in jft.hmc._DEBUG_STORE])
 
     for idx, dbgp in enumerate(debug_pos):
         plt.plot(signal_response(dbgp), label=f'{idx}', alpha=0.1)
     #plt.legend()
 
     # %%
-    debug_pos_x = jnp.array(jft.hmc._DEBUG_STORE)[:, 0, 0]
-    debug_pos_y = jnp.array(jft.hmc._DEBUG_STORE)[:, 0, 1]
+    debug_pos_x = debug_pos[:, 0]
+    debug_pos_y = debug_pos[:, 1]
     for idx, dbgp in enumerate(debug_pos):
         plt.scatter(debug_pos_x, debug_pos_y, s=0.1, color='k')
     #plt.legend()
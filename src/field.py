@@ -254,11 +254,10 @@ class Field(Operator):
         Field
             The weighted field.
         """
-        aout = self.val_rw()
-
         spaces = utilities.parse_spaces(spaces, len(self._domain))
 
         fct = 1.
+        wgts = []
         for ind in spaces:
             wgt = self._domain[ind].dvol
             if np.isscalar(wgt):
@@ -267,12 +266,21 @@ class Field(Operator):
                 new_shape = np.ones(len(self.shape), dtype=np.int64)
                 new_shape[self._domain.axes[ind][0]:
                           self._domain.axes[ind][-1]+1] = wgt.shape
-                wgt = wgt.reshape(new_shape)
-                aout *= wgt**power
+                wgts.append(wgt.reshape(new_shape)**power)
         fct = fct**power
-        if fct != 1.:
-            aout *= fct
+        if wgts:
+            # Fold the scalar factor into the much smaller weight array
+            wgts[0] = wgts[0]*fct
+        elif fct != 1.:
+            wgts.append(fct)
+        else:
+            return self
 
+        # Write the first product into a new array instead of copying the
+        # values first; keep the dtype as the previous in-place update did
+        aout = np.multiply(self._val, wgts[0], dtype=self._val.dtype)
+        for wgt in wgts[1:]:
+            aout *= wgt
         return Field(self._domain, aout)
 
     def outer(self, x):
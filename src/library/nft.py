@@ -40,6 +40,10 @@ class Gridder(LinearOperator):
         Requested precision, defaults to 2e-10.
     """
     def __init__(self, target, uv, eps=2e-10):
+        try:
+            from ducc0.wgridder import dirty2ms, ms2dirty
+        except ImportError:
+            raise ImportError("ducc0 needs to be installed for nifty.Gridder()")
         self._capability = self.TIMES | self.ADJOINT_TIMES
         self._target = makeDomain(target)
         for ii in [0, 1]:
@@ -58,21 +62,25 @@ class Gridder(LinearOperator):
         self._uvw[:, 0:2] = uv
         self._uvw[:, 2] = 0.
         self._eps = float(eps)
+        # Everything but the input is fixed; set it up once instead of on
+        # every application
+        self._ms2dirty, self._dirty2ms = ms2dirty, dirty2ms
+        self._freq = np.array([speed_of_light])
+        self._nxdirty, self._nydirty = self._target[0].shape
+        self._dstx, self._dsty = self._target[0].distances
 
     def apply(self, x, mode):
-        from ducc0.wgridder import dirty2ms, ms2dirty
         self._check_input(x, mode)
-        freq = np.array([speed_of_light])
         x = x.val
-        nxdirty, nydirty = self._target[0].shape
-        dstx, dsty = self._target[0].distances
         if mode == self.TIMES:
-            res = ms2dirty(self._uvw, freq, x.reshape((-1,1)), None, nxdirty,
-                           nydirty, dstx, dsty, 0, 0,
-                           self._eps, False, nthreads(), 0)
+            res = self._ms2dirty(self._uvw, self._freq, x.reshape((-1,1)),
+                                 None, self._nxdirty, self._nydirty,
+                                 self._dstx, self._dsty, 0, 0, self._eps,
+                                 False, nthreads(), 0)
         else:
-            res = dirty2ms(self._uvw, freq, x, None, dstx, dsty, 0, 0,
-                           self._eps, False, nthreads(), 0)
+            res = self._dirty2ms(self._uvw, self._freq, x, None, self._dstx,
+                                 self._dsty, 0, 0, self._eps, False,
+                                 nthreads(), 0)
             res = res.reshape((-1,))
         return makeField(self._tgt(mode), res)
 
@@ -88,10 +96,17 @@ class Nufft(LinearOperator):
         Coordinates of the data-points, shape (n, ndim).
     eps: float
         Requested precision, defaults to 2e-10.
+    nthreads : int, optional
+        Number of threads to use. Defaults to the global setting of
+        `nifty8.set_nthreads` at the time of construction.
+    single_precision : bool
+        Whether to perform the transform in single precision. Requires
+        `eps` to be larger than 1e-6. Defaults to False.
     """
-    def __init__(self, target, pos, eps=2e-10):
+    def __init__(self, target, pos, eps=2e-10, nthreads=None,
+                 single_precision=False):
         try:
-            from ducc0.nufft import nu2u, u2nu
+            from ducc0.nufft import plan
         except ImportError:
             raise ImportError("ducc0 needs to be installed for nifty.Nufft()")
         self._capability = self.TIMES | self.ADJOINT_TIMES
@@ -103,20 +118,44 @@ class Nufft(LinearOperator):
         if pos.ndim != 2:
             raise TypeError(f"pos needs to be 2d array (got shape {pos.shape})")
         self._domain = DomainTuple.make(UnstructuredDomain((pos.shape[0])))
+        if single_precision and eps <= 1e-6:
+            raise ValueError("eps needs to be larger than 1e-6 in single precision")
+        self._ctype = np.complex64 if single_precision else np.complex128
+        rtype = np.float32 if single_precision else np.float64
         dst = np.array(self._target[0].distances)
-        pos = (2*np.pi*pos*dst) % (2*np.pi)
-        self._args = dict(nthreads=1, epsilon=float(eps), coord=pos)
+        pos = np.ascontiguousarray((2*np.pi*pos*dst) % (2*np.pi), dtype=rtype)
+        if nthreads is None:
+            from ..ducc_dispatch import nthreads as default_nthreads
+            nthreads = default_nthreads()
+        self._pos, self._eps, self._nthreads = pos, float(eps), int(nthreads)
+        self._plan = None
 
-    def apply(self, x, mode):
-        from ducc0.nufft import nu2u, u2nu
+    def _get_plan(self):
+        # The plan sorts the points and sets up the gridding kernel once such
+        # that repeated applications, e.g. within a CG, only do the actual
+        # gridding and FFT. Its precision is fixed by the one of `pos`. It is
+        # built on first use since it cannot be pickled.
+        if self._plan is None:
+            from ducc0.nufft import plan
 
+            self._plan = plan(nu2u=True, coord=self._pos,
+                              grid_shape=self._target.shape,
+                              epsilon=self._eps, nthreads=self._nthreads)
+        return self._plan
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_plan"] = None
+        return state
+
+    def apply(self, x, mode):
         self._check_input(x, mode)
+        # NOTE, `astype` always copies; only convert if necessary
+        x = np.ascontiguousarray(x.val, dtype=self._ctype)
         if mode == self.TIMES:
-            res = np.empty(self.target.shape, dtype=x.dtype)
-            nu2u(points=x.val, out=res, forward=False, **self._args)
-            res = res.real
+            res = self._get_plan().nu2u(points=x, forward=False).real
         else:
-            res = u2nu(grid=x.val.astype('complex128'), forward=True, **self._args)
+            res = self._get_plan().u2nu(grid=x, forward=True)
             #if res.ndim == 0:
                 #res = np.array([res])
         return makeField(self._tgt(mode), res)
@@ -18,8 +18,12 @@ import os
 import pickle
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from warnings import warn
 
+import numpy as np
+
 from .. import utilities
 from ..field import Field
 from ..multi_domain import MultiDomain
@@ -27,6 +31,10 @@ from ..multi_field import MultiField
 from ..operators.operator import Operator
 from ..utilities import get_MPI_params_from_comm, shareRange
 
+# Maximum number of samples exchanged in a single broadcast by
+# `SampleListBase.iterator`
+_ITERATOR_CHUNK_SIZE = 4
+
 
 class SampleListBase:
     """Base class for storing lists of fields representing samples.
@@ -70,6 +78,7 @@ class SampleListBase:
             self._active_comm = comm.Split(color, key)
 
         self._n_samples = utilities.allreduce_sum([self.n_local_samples], self.comm)
+        self._MPI_master = utilities.get_MPI_params_from_comm(comm)[2]
 
     @property
     def n_local_samples(self):
@@ -97,7 +106,7 @@ class SampleListBase:
 
     @property
     def MPI_master(self):
-        return utilities.get_MPI_params_from_comm(self.comm)[2]
+        return self._MPI_master
 
     @property
     def domain(self):
@@ -105,7 +114,7 @@ class SampleListBase:
         return self._domain
 
     def save_to_hdf5(self, file_name, op=None, samples=False, mean=False, std=False,
-                     overwrite=False):
+                     overwrite=False, compression=None):
         """Write sample list to HDF5 file.
 
         This function writes sample lists to HDF5 files that contain two
@@ -142,6 +151,18 @@ class SampleListBase:
         overwrite : bool
             If True, a potentially existing file with the same file name as
             `file_name`, is overwritten.
+        compression : str or None
+            Compression filter applied to the data sets, e.g. "lzf" or "gzip".
+            Compressed data sets are stored in chunks of about 512 KiB. This
+            usually shrinks the file considerably for smooth fields at the
+            cost of some CPU time on writing and reading. Default: None.
+
+        Note
+        ----
+        If the sample list is distributed and h5py has been built with MPI
+        support, all tasks write their local samples to the file in parallel.
+        Otherwise, or if `compression` is set, all samples are sent to the
+        master task which writes them.
         """
         import h5py
 
@@ -154,8 +175,20 @@ class SampleListBase:
         if not (samples or mean or std):
             raise ValueError("Neither samples nor mean nor standard deviation shall be written.")
 
-        if self.MPI_master:
+        # Let every task write its own samples if h5py has been built with MPI
+        # support instead of sending all samples to the master task
+        # NOTE, filters require collective writes in parallel HDF5 which do not
+        # fit tasks writing distinct data sets
+        parallel = (self.comm is not None and h5py.get_config().mpi
+                    and compression is None)
+        if parallel:
+            _barrier(self.comm)  # wait for the master to remove the old file
+            f = h5py.File(file_name, "w", driver="mpio", comm=self.comm)
+        elif self.MPI_master:
             f = h5py.File(file_name, "w")
+        else:
+            f = utilities.Nop()
+        if parallel or self.MPI_master:
             if isinstance(op, Operator):
                 f.attrs["nifty operator string representation"] = str(op)
                 f.attrs["nifty operator domain"] = repr(op.domain)
@@ -163,14 +196,15 @@ class SampleListBase:
                 f.attrs["nifty domain"] = repr(op.target)
             else:
                 f.attrs["nifty domain"] = repr(self.domain)
-        else:
-            f = utilities.Nop()
 
         # TODO Add some meta information (e.g. k_length for PowerSpace, distances for RGSpace)
         if samples:
             grp = f.create_group("samples")
-            for ii, ss in enumerate(self.iterator(op)):
-                _field2hdf5(grp, ss, str(ii))
+            if parallel:
+                self._samples2hdf5_parallel(grp, _none_to_id(op))
+            else:
+                for ii, ss in enumerate(self.iterator(op)):
+                    _field2hdf5(grp, ss, str(ii), compression)
         if std:
             grp = f.create_group("stats")
             m, v = self.sample_stat(op)
@@ -179,12 +213,46 @@ class SampleListBase:
                 grp = f.create_group("stats")
                 m = self.average(op)
         if mean:
-            _field2hdf5(grp, m, "mean")
+            self._stat2hdf5(grp, m, "mean", parallel, compression)
         if std:
-            _field2hdf5(grp, v.sqrt(), "standard deviation")
+            self._stat2hdf5(grp, v.sqrt(), "standard deviation", parallel,
+                            compression)
 
+        # Closing the file is collective in parallel mode, only wait for the
+        # master to finish writing otherwise
         f.close()
-        _barrier(self.comm)
+        if not parallel:
+            _barrier(self.comm)
+
+    def _samples2hdf5_parallel(self, file_handle, op):
+        # Dataset creation is collective, i.e. all tasks need to know the
+        # layout of all samples before any of them is written. All samples
+        # share the target of `op`, thus the layout is taken from the first
+        # sample of each task. The samples are then written independently,
+        # each one as soon as it has been computed.
+        local = zip(self.local_indices, self.local_iterator())
+        first = next(local, None)
+        if first is not None:
+            first = first[0], op(first[1])
+        layouts = self.comm.allgather(None if first is None else _hdf5_layout(first[1]))
+        layouts = [ll for ll in layouts if ll is not None]
+        if any(ll != layouts[0] for ll in layouts[1:]):
+            raise ValueError("all samples need to have the same shapes and dtypes")
+        for ii in range(self.n_samples):
+            _create_hdf5_datasets(file_handle, layouts[0], str(ii))
+        if first is not None:
+            _write_to_hdf5(file_handle, first[1], str(first[0]))
+            first = None
+        for ii, ss in local:
+            _write_to_hdf5(file_handle, op(ss), str(ii))
+
+    def _stat2hdf5(self, file_handle, obj, name, parallel, compression):
+        if not parallel:
+            return _field2hdf5(file_handle, obj, name, compression)
+        # All tasks hold the statistics; only the master needs to write them
+        _create_hdf5_datasets(file_handle, _hdf5_layout(obj), name)
+        if self.MPI_master:
+            _write_to_hdf5(file_handle, obj, name)
 
     def save_to_fits(self, file_name_base, op=None, samples=False, mean=False, std=False,
                      overwrite=False):
@@ -251,7 +319,10 @@ class SampleListBase:
         h["CTYPE2"] = "DEC---SIN"
         h["EQUINOX"] = 2000
 
-        hdu = pyfits.PrimaryHDU(fld.val[:, :].T, header=h)
+        # FITS is big-endian and column-major; hand over a writable C-ordered
+        # copy of the transpose such that astropy can byteswap it in place for
+        # writing
+        hdu = pyfits.PrimaryHDU(np.ascontiguousarray(fld.val.T), header=h)
         hdulist = pyfits.HDUList([hdu])
         if self.MPI_master:
             hdulist.writeto(file_name, overwrite=overwrite)
@@ -271,13 +342,25 @@ class SampleListBase:
         Note
         ----
         Calling this function involves MPI communication if `comm != None`.
+        The samples are exchanged in chunks of up to
+        `_ITERATOR_CHUNK_SIZE` samples, i.e. every task temporarily holds
+        that many samples in addition to its local ones.
         """
         op = _none_to_id(op)
         if self.comm is not None:
-            for itask in range(self.comm.Get_size()):
-                for i in range(_bcast(self.n_local_samples, self._comm, itask)):
-                    ss = self.local_item(i) if itask == self._comm.Get_rank() else None
-                    yield op(_bcast(ss, self._comm, itask))
+            # Gather the number of samples of all tasks in one call and
+            # broadcast the samples in chunks of bounded size. This trades a
+            # few samples of memory for fewer collective calls.
+            comm = self._comm
+            rank = comm.Get_rank()
+            for itask, n_local in enumerate(comm.allgather(self.n_local_samples)):
+                for lo in range(0, n_local, _ITERATOR_CHUNK_SIZE):
+                    hi = min(lo + _ITERATOR_CHUNK_SIZE, n_local)
+                    chunk = None
+                    if itask == rank:
+                        chunk = [self.local_item(i) for i in range(lo, hi)]
+                    for ss in comm.bcast(chunk, root=itask):
+                        yield op(ss)
         else:
             for ss in self.local_iterator():
                 yield op(ss)
@@ -298,15 +381,19 @@ class SampleListBase:
 
         Note
         ----
-        Calling this function involves allocating arrays for all samples and
-        averaging them afterwards. If the number of local samples is big and
-        `op` is not None, this leads to much temporary memory usage. If the
-        output of `op` is just a :class:`~nifty8.field.Field` or
+        If `comm != None`, calling this function involves allocating arrays
+        for all local samples and averaging them afterwards. If the number of
+        local samples is big and `op` is not None, this leads to much
+        temporary memory usage. If the output of `op` is just a
+        :class:`~nifty8.field.Field` or
         :class:`~nifty8.multi_field.MultiField`, :attr:`sample_stat()`
         can be used in order to compute the average memory efficiently.
         """
-        res = self._prepare_average(op)
         n = self.n_samples
+        if self.comm is None:
+            op = _none_to_id(op)
+            return _pairwise_sum(op(ss) for ss in self.local_iterator()) / n
+        res = self._prepare_average(op)
         return utilities.allreduce_sum(res, self.comm) / n
 
     def _average_tuple(self, op):
@@ -363,9 +450,20 @@ class SampleListBase:
         if self.n_samples == 1:
             res = self.average(op)
             return res, 0*res
+        op = _none_to_id(op)
         sc = StatCalculator()
-        for ss in self.iterator(op):
-            sc.add(ss)
+        for ss in self.local_iterator():
+            sc.add(op(ss))
+        if self.comm is None:
+            return sc.mean, sc.var
+        # Only communicate the statistics of each task instead of all samples.
+        # Merge them in the same order on all tasks such that the result is
+        # identical everywhere.
+        stats = self.comm.allgather(sc if sc.count > 0 else None)
+        sc = StatCalculator()
+        for ss in stats:
+            if ss is not None:
+                sc.merge(ss)
         return sc.mean, sc.var
 
     def save(self, file_name_base, overwrite=False):
@@ -423,14 +521,20 @@ class SampleListBase:
         This function distributes the samples according to the standard NIFTy
         distribution scheme (see `ift.utilities.shareRange`).
         """
-        base_dir, base_file = os.path.split(os.path.abspath(file_name_base))
-        files = [ff for ff in os.listdir(base_dir)
-                 if re.match(f"{base_file}.[0-9]+.pickle", ff)]
-        if len(files) == 0:
+        ntask, rank, master = get_MPI_params_from_comm(comm)
+        # Only list the directory once and share the result with all tasks
+        n_samples = None
+        if master:
+            base_dir, base_file = os.path.split(os.path.abspath(file_name_base))
+            pattern = re.compile(rf"{re.escape(base_file)}\.([0-9]+)\.pickle")
+            ids = [int(mm.group(1)) for mm in map(pattern.fullmatch, os.listdir(base_dir))
+                   if mm is not None]
+            n_samples = max(ids) + 1 if len(ids) > 0 else 0
+        if comm is not None:
+            n_samples = comm.bcast(n_samples, root=0)
+        if n_samples == 0:
             raise RuntimeError(f"No files matching `{file_name_base}.*.pickle`")
-        n_samples = max(list(map(lambda x: int(x.split(".")[-2]), files))) + 1
 
-        ntask, rank, _ = get_MPI_params_from_comm(comm)
         local_indices = range(*shareRange(n_samples, ntask, rank))
         files = [f"{file_name_base}.{ii}.pickle" for ii in local_indices]
         for ff in files:
@@ -508,12 +612,12 @@ class ResidualSampleList(SampleListBase):
         return ResidualSampleList(mean, self._r, self._n, self.comm)
 
     def save(self, file_name_base, overwrite=False):
-        for ii, isample in enumerate(self.local_indices):
-            obj = [self._r[ii], self._n[ii]]
-            fname = _sample_file_name(file_name_base, isample)
-            _save_to_disk(fname, obj, overwrite)
+        fnames = [_sample_file_name(file_name_base, isample) for isample in self.local_indices]
+        objs = [[rr, nn] for rr, nn in zip(self._r, self._n)]
         if self.MPI_master:
-            _save_to_disk(f"{file_name_base}.mean.pickle", self._m, overwrite)
+            fnames.append(f"{file_name_base}.mean.pickle")
+            objs.append(self._m)
+        _threaded_map(partial(_save_to_disk, overwrite=overwrite), fnames, objs)
         _barrier(self.comm)
 
     @classmethod
@@ -521,7 +625,7 @@ class ResidualSampleList(SampleListBase):
         _barrier(comm)
         mean = _load_from_disk(f"{file_name_base}.mean.pickle")
         files = cls._list_local_sample_files(file_name_base, comm)
-        tmp = [_load_from_disk(ff) for ff in files]
+        tmp = _threaded_map(_load_from_disk, files)
         res = [aa[0] for aa in tmp]
         neg = [aa[1] for aa in tmp]
         return cls(mean, res, neg, comm=comm)
@@ -568,12 +672,8 @@ class SampleList(SampleListBase):
         return self._s[i]
 
     def save(self, file_name_base, overwrite=False):
-        nsample = self.n_samples
-        for isample in range(nsample):
-            if isample in self.local_indices:
-                obj = self._s[isample-self.local_indices[0]]
-                fname = _sample_file_name(file_name_base, isample)
-                _save_to_disk(fname, obj, overwrite=True)
+        fnames = [_sample_file_name(file_name_base, isample) for isample in self.local_indices]
+        _threaded_map(partial(_save_to_disk, overwrite=True), fnames, self._s)
         _barrier(self.comm)
 
     @classmethod
@@ -585,7 +685,7 @@ class SampleList(SampleListBase):
             logger.warning(f"{foo} is present. Most probably you intended to "
                          "call `ift.ResidualSampleList.load()`.")
         files = cls._list_local_sample_files(file_name_base, comm)
-        samples = [_load_from_disk(ff) for ff in files]
+        samples = _threaded_map(_load_from_disk, files)
         dom = None
         if comm is not None:
             if comm.Get_rank() == 0:
@@ -603,26 +703,10 @@ def _none_to_id(obj):
     if obj is None:
         return lambda x: x
     if isinstance(obj, Operator):
-        return lambda x: obj.force(x)
+        return obj.force
     return obj
 
 
-def _bcast(obj, comm, root):
-    """Broadcast python object from given root.
-
-    Parameters
-    ----------
-    obj : object
-        The object to be broadcasted.
-    comm : MPI communicator
-        MPI communicator used for the broadcasting.
-    root : int
-        MPI task number from which the object shall be sent.
-    """
-    data = obj if comm.Get_rank() == root else None
-    return comm.bcast(data, root=root)
-
-
 def _sample_file_name(file_name_base, isample):
     """Return sample-unique file name.
 
@@ -653,17 +737,72 @@ def _save_to_disk(file_name, obj, overwrite=False):
         pickle.dump(obj, f, pickle.HIGHEST_PROTOCOL)
 
 
-def _field2hdf5(file_handle, obj, name):
+def _threaded_map(func, *iterables):
+    """Apply `func` to the items of `iterables` in a pool of threads.
+
+    This is used for reading and writing sample files such that the file I/O
+    of one sample overlaps with (un)pickling another one. Exceptions are
+    re-raised and the results are returned as list in order.
+    """
+    with ThreadPoolExecutor() as executor:
+        return list(executor.map(func, *iterables))
+
+
+def _field2hdf5(file_handle, obj, name, compression=None):
+    _create_hdf5_datasets(file_handle, _hdf5_layout(obj), name, compression)
+    _write_to_hdf5(file_handle, obj, name)
+
+
+def _hdf5_layout(obj):
+    """Return the shapes and dtypes of the HDF5 data sets representing `obj`.
+
+    For a :class:`~nifty8.multi_field.MultiField`, a dictionary with the
+    layouts of its entries is returned.
+    """
+    if isinstance(obj, MultiField):
+        return {kk: _hdf5_layout(fld) for kk, fld in obj.items()}
+    if not isinstance(obj, Field):
+        raise TypeError
+    return obj.shape, obj.dtype
+
+
+def _hdf5_chunks(shape, dtype, nbytes=512*1024):
+    """Return a chunk shape of at most about `nbytes` bytes.
+
+    The chunks are obtained by successively halving the longest axis of
+    `shape` such that neighboring entries along the trailing axes stay
+    together as long as possible.
+    """
+    chunks = list(shape)
+    itemsize = np.dtype(dtype).itemsize
+    while np.prod(chunks)*itemsize > nbytes and max(chunks) > 1:
+        i = int(np.argmax(chunks))
+        chunks[i] = (chunks[i] + 1)//2
+    return tuple(chunks)
+
+
+def _create_hdf5_datasets(file_handle, layout, name, compression=None):
     if not isinstance(name, str):
         raise TypeError
-    if isinstance(obj, MultiField):
+    if isinstance(layout, dict):
         grp = file_handle.create_group(name)
+        for kk, ll in layout.items():
+            _create_hdf5_datasets(grp, ll, kk, compression)
+        return
+    shape, dtype = layout
+    kwargs = {}
+    # Scalar data sets can neither be chunked nor compressed
+    if compression is not None and len(shape) > 0:
+        kwargs = dict(chunks=_hdf5_chunks(shape, dtype), compression=compression)
+    file_handle.create_dataset(name, shape=shape, dtype=dtype, **kwargs)
+
+
+def _write_to_hdf5(file_handle, obj, name):
+    if isinstance(obj, MultiField):
         for kk, fld in obj.items():
-            _field2hdf5(grp, fld, kk)
+            _write_to_hdf5(file_handle[name], fld, kk)
         return
-    if not isinstance(obj, Field):
-        raise TypeError
-    file_handle.create_dataset(name, data=obj.val)
+    file_handle[name][...] = obj.val
 
 
 def _barrier(comm):
@@ -671,6 +810,29 @@ def _barrier(comm):
         comm.Barrier()
 
 
+def _pairwise_sum(iterable):
+    """Sum up the items of `iterable` pairwise while consuming it.
+
+    The items are added in the very same order as in
+    :func:`~nifty8.utilities.allreduce_sum` without MPI such that the results
+    are identical. However, at most a logarithmic number of partial sums is
+    kept in memory instead of all items.
+    """
+    # Stack of partial sums together with the number of items they contain
+    stack = []
+    for val in iterable:
+        cnt = 1
+        while len(stack) > 0 and stack[-1][1] == cnt:
+            prev, _ = stack.pop()
+            val, cnt = prev + val, 2*cnt
+        stack.append((val, cnt))
+    val, _ = stack.pop()
+    while len(stack) > 0:
+        prev, _ = stack.pop()
+        val = prev + val
+    return val
+
+
 def _list_transpose(list_of_lists):
     ny = len(list_of_lists[0])
     return [[elem[ii] for elem in list_of_lists] for ii in range(ny)]
@@ -255,12 +255,17 @@ class _SlowFieldAdapter(LinearOperator):
         self._domain = tmp
         self._target = tmp[name]
         self._capability = self.TIMES | self.ADJOINT_TIMES
+        # Fields are immutable, hence the zeros for all other keys can be
+        # shared by all adjoint applications
+        self._idx = tmp.idx[self._name]
+        self._zeros = tuple(Field(dom, 0.) for dom in tmp.domains())
 
     def apply(self, x, mode):
         self._check_input(x, mode)
         if isinstance(x, MultiField):
             return x[self._name]
-        return MultiField.from_dict({self._name: x}, domain=self._tgt(mode))
+        res = self._zeros[:self._idx] + (x,) + self._zeros[self._idx+1:]
+        return MultiField(self._domain, res)
 
     def __repr__(self):
         return '_SlowFieldAdapter'
@@ -389,6 +394,10 @@ class NullOperator(LinearOperator):
         self._domain = makeDomain(domain)
         self._target = makeDomain(target)
         self._capability = self.TIMES | self.ADJOINT_TIMES
+        # Fields are immutable and the zeros are broadcast views, hence the
+        # results can be built once and handed out for every application
+        self._null = {self.TIMES: self._nullfield(self._target),
+                      self.ADJOINT_TIMES: self._nullfield(self._domain)}
 
     @staticmethod
     def _nullfield(dom):
@@ -399,7 +408,7 @@ class NullOperator(LinearOperator):
 
     def apply(self, x, mode):
         self._check_input(x, mode)
-        return self._nullfield(self._tgt(mode))
+        return self._null[mode]
 
     def __repr__(self):
         dom = self.domain.keys() if isinstance(self.domain, MultiDomain) else '()'
@@ -418,17 +427,19 @@ class PartialExtractor(LinearOperator):
         for key in self._target.keys():
             check_object_identity(self._domain[key], self._target[key])
         self._capability = self.TIMES | self.ADJOINT_TIMES
-        self._compldomain = MultiDomain.make({kk: self._domain[kk]
-                                              for kk in self._domain.keys()
-                                              if kk not in self._target.keys()})
+        # Zeros for the keys missing from the target; fields are immutable,
+        # hence these can be shared by all adjoint applications
+        self._zeros = {kk: Field(self._domain[kk], 0.)
+                       for kk in self._domain.keys()
+                       if kk not in self._target.keys()}
 
     def apply(self, x, mode):
         self._check_input(x, mode)
         if mode == self.TIMES:
             return x.extract(self._target)
-        res0 = MultiField.from_dict({key: x[key] for key in x.domain.keys()})
-        res1 = MultiField.full(self._compldomain, 0.)
-        return res0.unite(res1)
+        res = tuple(x[kk] if kk in x else self._zeros[kk]
+                    for kk in self._domain.keys())
+        return MultiField(self._domain, res)
 
     def __repr__(self):
         return f'{self.target.keys()} <- {self.domain.keys()}'
@@ -454,11 +465,9 @@ class PrependKey(LinearOperator):
 
     def apply(self, x, mode):
         self._check_input(x, mode)
-        if mode == self.TIMES:
-            res = {self._pre+k:x[k] for k in self._domain.keys()}
-        else:
-            res = {k:x[self._pre+k] for k in self._domain.keys()}
-        return MultiField.from_dict(res, domain=self._tgt(mode))
+        # Prepending the same string does not change the order of the sorted
+        # keys, so the fields can be passed on as they are
+        return MultiField(self._tgt(mode), x.values())
 
 
 class DomainChangerAndReshaper(LinearOperator):
@@ -52,6 +52,38 @@ class StatCalculator:
             delta2 = value - self._mean
             self._M2 = self._M2 + delta*delta2
 
+    def merge(self, other):
+        """Adds all samples of another :class:`StatCalculator`.
+
+        Parameters
+        ----------
+        other: StatCalculator
+            The statistics to be merged into this one. It is not modified.
+
+        Notes
+        -----
+        The statistics are combined with the parallel algorithm of Chan et al.
+        such that the samples of `other` are not needed.
+        """
+        if other._count == 0:
+            return
+        if self._count == 0:
+            self._count = other._count
+            self._mean, self._M2 = 1.*other._mean, 1.*other._M2
+            return
+        tot = self._count + other._count
+        delta = other._mean - self._mean
+        self._mean = self._mean + delta*(other._count/tot)
+        self._M2 = self._M2 + other._M2 + delta*delta*(self._count*other._count/tot)
+        self._count = tot
+
+    @property
+    def count(self):
+        """
+        int : the number of samples added so far.
+        """
+        return self._count
+
     @property
     def mean(self):
         """
@@ -6,6 +6,7 @@ from typing import Any, Callable, NamedTuple, Optional, Tuple, Union
 
 import jax
 from jax import numpy as jnp
+from jax.tree_util import Partial
 
 from .logger import logger
 from .misc import doc_from
@@ -34,6 +35,13 @@ def cg(mat, j, x0=None, *args, **kwargs) -> Tuple[Any, Union[int, jnp.ndarray]]:
     -----
     If set, the parameters `absdelta` and `resnorm` always take precedence over
     `tol` and `atol`.
+
+    For `cg`, `dtype_matvec` may be set to a lower precision floating point
+    type, e.g. `jnp.bfloat16`, in which the search direction is passed to
+    `mat`. The CG iterates and all inner products are still accumulated in
+    the precision of `j`, and the residual is periodically recomputed at full
+    precision. This trades accuracy of the solution for bandwidth of the
+    matrix-vector products.
     """
     assert_arithmetics(j)
     if x0 is not None:
@@ -74,6 +82,42 @@ def _cg_pretty_print_it(
 
 
 # Taken from nifty
+def _mat_in_dtype(mat, dtype):
+    """Wraps `mat` such that it is applied to the floating point leaves of its
+    input cast to `dtype` and its output is cast back to the input's dtypes."""
+    def cast(x, dtp):
+        return x.astype(dtp) if jnp.issubdtype(x.dtype, jnp.floating) else x
+
+    def mat_in_dtype(x):
+        y = mat(jax.tree_util.tree_map(partial(cast, dtp=dtype), x))
+        return jax.tree_util.tree_map(lambda y, x: y.astype(x.dtype), y, x)
+
+    return mat_in_dtype
+
+
+@partial(jax.jit, static_argnames=("norm_ord", ))
+def _cg_residual_stats(pos, r, j, *, norm_ord=None):
+    """Returns the squared norm of the residual `r`, its norm of order
+    `norm_ord` (`None` if `norm_ord` is `None`) and the CG energy at `pos`.
+
+    Computing them in one compiled function lets XLA fuse the reductions
+    instead of streaming the vectors through memory once per quantity.
+    """
+    gamma = vdot(r, r)
+    norm = None if norm_ord is None else jft_norm(r, ord=norm_ord)
+    energy = vdot((r - j) / 2, pos)
+    return gamma, norm, energy
+
+
+@partial(jax.jit, static_argnames=("norm_ord", ))
+def _cg_step(pos, r, d, q, alpha, j, *, norm_ord=None):
+    """Updates the position and the residual of the CG and returns them
+    together with the statistics of `_cg_residual_stats`."""
+    pos = pos - alpha * d
+    r = r - q * alpha
+    return (pos, r) + _cg_residual_stats(pos, r, j, norm_ord=norm_ord)
+
+
 def _cg(
     mat,
     j,
@@ -88,8 +132,12 @@ def _cg(
     maxiter=None,
     name=None,
     time_threshold=None,
+    dtype_matvec=None,
     _raise_nonposdef=True
 ) -> CGResults:
+    # Only the search directions are passed through the low precision matvec,
+    # the periodic restart of the residual uses `mat` as is
+    mat_d = mat if dtype_matvec is None else _mat_in_dtype(mat, dtype_matvec)
     norm_ord = 2 if norm_ord is None else norm_ord  # TODO: change to 1
     maxiter_fallback = 20 * size(j)  # taken from SciPy's NewtonCG minimzer
     miniter = min(
@@ -105,6 +153,9 @@ def _cg(
     common_dtp = result_type(j)
     eps = 6. * jnp.finfo(common_dtp).eps  # taken from SciPy's NewtonCG minimzer
     tiny = 6. * jnp.finfo(common_dtp).tiny
+    if dtype_matvec is not None:
+        # The energy is only as accurate as the matrix-vector products
+        eps = max(eps, 6. * jnp.finfo(dtype_matvec).eps)
 
     if x0 is None:
         pos = zeros_like(j)
@@ -143,11 +194,27 @@ def _cg(
         info = 0
         return CGResults(x=pos, info=info, nit=0, nfev=nfev, success=True)
 
+    stats_norm_ord = None if resnorm is None else norm_ord
+
     for i in range(1, maxiter + 1):
-        q = mat(d)
+        q = mat_d(d)
         nfev += 1
 
-        curv = float(vdot(d, q))
+        curv = vdot(d, q)
+        alpha = previous_gamma / curv
+        reset = i % N_RESET == 0
+        if reset:
+            pos_new = pos - alpha * d
+            # Check the curvature before spending a matvec on the restart
+            curv = float(curv)
+        else:
+            pos_new, r_new, gamma, norm, new_energy = _cg_step(
+                pos, r, d, q, alpha, j, norm_ord=stats_norm_ord
+            )
+            # Fetch all scalars of the iteration with a single device sync
+            curv, gamma, norm, new_energy = jax.device_get(
+                (curv, gamma, norm, new_energy)
+            )
         if curv == 0.:
             if _raise_nonposdef:
                 nm = "CG" if name is None else name
@@ -165,14 +232,14 @@ def _cg(
                 pos = previous_gamma / (-curv) * j
                 info = 0
                 break
-        alpha = previous_gamma / curv
-        pos = pos - alpha * d
-        if i % N_RESET == 0:
-            r = mat(pos) - j
+        if reset:
+            r_new = mat(pos_new) - j
             nfev += 1
-        else:
-            r = r - q * alpha
-        gamma = float(vdot(r, r))
+            gamma, norm, new_energy = jax.device_get(
+                _cg_residual_stats(pos_new, r_new, j, norm_ord=stats_norm_ord)
+            )
+        pos, r = pos_new, r_new
+        gamma = float(gamma)
         if time_threshold is not None and datetime.now() > time_threshold:
             info = i
             break
@@ -182,13 +249,11 @@ def _cg(
             info = 0
             break
         if resnorm is not None:
-            norm = float(jft_norm(r, ord=norm_ord))
+            norm = float(norm)
             if norm < resnorm and i >= miniter:
                 info = 0
                 break
-        else:
-            norm = None
-        new_energy = float(vdot((r - j) / 2, pos))
+        new_energy = float(new_energy)
         energy_diff = energy - new_energy
         neg_energy_eps = -eps * jnp.abs(new_energy)
         if energy_diff < neg_energy_eps:
@@ -229,7 +294,7 @@ def _static_cg(
     miniter=None,
     maxiter=None,
     name=None,
-    _raise_nonposdef=False,  # TODO
+    _raise_nonposdef=True,
     **kwargs
 ) -> CGResults:
     from jax.experimental.host_callback import call
@@ -239,7 +304,14 @@ def _static_cg(
     # function, we do it here to avoid the overhead of jitting through `mat`
     # multiple times within the CG loop. This is safe because the call to
     # `while_loop` in CG implies a JIT anyways.
-    mat = jax.jit(mat)
+    if isinstance(mat, Partial):
+        # Jit the wrapped function instead of the freshly bound `Partial`.
+        # This way the bound arguments, e.g. the position of a Newton step,
+        # are traced instead of baked into the program and repeated calls
+        # with new arguments reuse the same trace and compilation.
+        mat = Partial(jax.jit(mat.func), *mat.args, **mat.keywords)
+    else:
+        mat = jax.jit(mat)
 
     norm_ord = 2 if norm_ord is None else norm_ord  # TODO: change to 1
     maxiter_fallback = 20 * size(j)  # taken from SciPy's NewtonCG minimzer
@@ -272,11 +344,20 @@ def _static_cg(
 
         q = mat(d)
         curv = vdot(d, q)
-        # ValueError("zero curvature in conjugate gradient")
-        info = jnp.where(curv == 0., -1, info)
+        if _raise_nonposdef:
+            # ValueError("zero curvature in conjugate gradient")
+            info = jnp.where(curv == 0., -1, info)
         alpha = previous_gamma / curv
-        # ValueError("implausible gradient scaling `alpha < 0`")
-        info = jnp.where(alpha < 0., -1, info)
+        if _raise_nonposdef:
+            # ValueError("implausible gradient scaling `alpha < 0`")
+            info = jnp.where(alpha < 0., -1, info)
+        # Same as in `_cg`, without raising stop at non-positive curvature and
+        # keep the previous position or, in the first iteration, use the
+        # gradient scaled by the (absolute) curvature
+        nonposdef = curv <= 0.
+        nonposdef_pos = where(
+            (curv < 0.) & (i == 1), previous_gamma / (-curv) * j, pos
+        )
         pos = pos - alpha * d
         r = cond(
             i % N_RESET == 0, lambda x: mat(x["pos"]) - x["j"],
@@ -311,6 +392,9 @@ def _static_cg(
                 info
             )
         info = jnp.where((i >= maxiter) & (info != -1), i, info)
+        if not _raise_nonposdef:
+            info = jnp.where(nonposdef, 0, info)
+            pos = where(nonposdef, nonposdef_pos, pos)
 
         d = d * jnp.maximum(0, gamma / previous_gamma) + r
 
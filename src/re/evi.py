@@ -367,8 +367,12 @@ class Samples():
         return tree_map(lambda p, s: p + get(s), self.pos, self._samples)
 
     def __iter__(self):
+        if len(self) == 0:
+            return
+        # Add the offset to all samples at once instead of once per sample
+        smpls = self.samples
         for i in range(len(self)):
-            yield self[i]
+            yield tree_map(lambda s: s[i], smpls)
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, self.__class__):
@@ -1,15 +1,15 @@
 # SPDX-License-Identifier: GPL-2.0+ OR BSD-2-Clause
 
 from functools import partial
-from typing import Callable, NamedTuple, TypeVar, Union
+from typing import Callable, NamedTuple, Optional, TypeVar, Union
 
 from jax import lax
 from jax import numpy as jnp
 from jax import random, tree_util
 from jax.experimental import host_callback
-from jax.scipy.special import expit
+from jax.nn import sigmoid
 
-from .lax import cond, fori_loop, while_loop
+from .lax import fori_loop, while_loop
 from .tree_math import random_like
 
 _DEBUG_FLAG = False
@@ -38,7 +38,9 @@ def _DEBUG_FINISH_SUBTREE(dummy_arg):
 
 
 def select(pred, on_true, on_false):
-    return tree_util.tree_map(partial(lax.select, pred), on_true, on_false)
+    # NOTE, use a broadcasting `where` per leaf such that under `vmap` (e.g.
+    # over chains) the selection becomes a single predicated move per leaf
+    return tree_util.tree_map(partial(jnp.where, pred), on_true, on_false)
 
 
 ### COMMON FUNCTIONALITY
@@ -54,13 +56,19 @@ class QP(NamedTuple):
         Position.
     momentum : Q
         Momentum.
+    potential_energy : Union[jnp.ndarray, float], optional
+        Cached potential energy at `position`.
+    potential_energy_gradient : Q, optional
+        Cached gradient of the potential energy at `position`.
     """
     position: Q
     momentum: Q
+    potential_energy: Optional[Union[jnp.ndarray, float]] = None
+    potential_energy_gradient: Optional[Q] = None
 
 
 def flip_momentum(qp: QP) -> QP:
-    return QP(position=qp.position, momentum=-qp.momentum)
+    return qp._replace(momentum=-qp.momentum)
 
 
 def sample_momentum_from_diagonal(*, key, mass_matrix_sqrt):
@@ -129,6 +137,68 @@ def leapfrog_step(
     return qp_fullstep
 
 
+def leapfrog_step_w_value_and_grad(
+    potential_energy_value_and_grad,
+    kinetic_energy_gradient,
+    step_size,
+    inverse_mass_matrix,
+    qp: QP,
+):
+    """
+    Perform one iteration of the leapfrog integrator forwards in time using
+    and updating the potential energy and its gradient cached in `qp`.
+
+    The gradient at the end of one step is the one needed for the first
+    half-step of the next, thus only a single evaluation of
+    `potential_energy_value_and_grad` is required per step. The cached
+    potential energy is used by the acceptance criteria.
+
+    Parameters
+    ----------
+    potential_energy_value_and_grad: Callable[[ndarray], Tuple[float, ndarray]]
+        Potential energy part of the hamiltonian (V) and its gradient. Depends
+        on position only.
+    qp: QP
+        Point in position and momentum space from which to start integration.
+        Its potential energy and gradient must be cached.
+    step_size: float
+        Step length (usually called epsilon) of the leapfrog integrator.
+    """
+    position = qp.position
+    momentum = qp.momentum
+
+    momentum_halfstep = (
+        momentum - (step_size / 2.) * qp.potential_energy_gradient
+    )
+
+    position_fullstep = position + step_size * kinetic_energy_gradient(
+        inverse_mass_matrix, momentum_halfstep
+    )
+
+    pot_fullstep, pot_grad_fullstep = potential_energy_value_and_grad(
+        position_fullstep
+    )
+    momentum_fullstep = (
+        momentum_halfstep - (step_size / 2.) * pot_grad_fullstep
+    )
+
+    qp_fullstep = QP(
+        position=position_fullstep,
+        momentum=momentum_fullstep,
+        potential_energy=pot_fullstep,
+        potential_energy_gradient=pot_grad_fullstep
+    )
+
+    global _DEBUG_FLAG
+    if _DEBUG_FLAG:
+        # append result without the cache to global list variable
+        host_callback.call(
+            _DEBUG_ADD_QP, QP(position_fullstep, momentum_fullstep)
+        )
+
+    return qp_fullstep
+
+
 ### SIMPLE HMC
 class AcceptedAndRejected(NamedTuple):
     accepted_qp: QP
@@ -159,6 +229,12 @@ def generate_hmc_acc_rej(
         The number of steps the leapfrog integrator should perform.
     step_size: float
         The step size (usually epsilon) for the leapfrog integrator.
+
+    Notes
+    -----
+    If the `stepper` caches the potential energy in the returned `QP`, e.g.
+    `leapfrog_step_w_value_and_grad`, the cached values are used for the
+    acceptance and are part of the accepted `QP`.
     """
     loop_body = partial(stepper, step_size, inverse_mass_matrix)
     new_qp = fori_loop(
@@ -179,9 +255,13 @@ def generate_hmc_acc_rej(
     )
     energy_diff = total_energy(initial_qp) - total_energy(proposed_qp)
     energy_diff = jnp.where(jnp.isnan(energy_diff), jnp.inf, energy_diff)
-    transition_probability = jnp.minimum(1., jnp.exp(energy_diff))
-
-    accept = random.bernoulli(key, transition_probability)
+    # Accept if log(U) < -(H_new - H_old) instead of drawing from a Bernoulli
+    # distribution with probability min(1, exp(-(H_new - H_old))). This saves
+    # the exponential and can not overflow for large energy differences.
+    log_uniform = jnp.log(
+        random.uniform(key, dtype=jnp.result_type(energy_diff))
+    )
+    accept = log_uniform < energy_diff
     accepted_qp, rejected_qp = select(
         accept,
         (proposed_qp, initial_qp),
@@ -228,8 +308,10 @@ class Tree(NamedTuple):
 
 
 def total_energy_of_qp(qp, potential_energy, kinetic_energy_w_inv_mass):
-    return potential_energy(qp.position
-                           ) + kinetic_energy_w_inv_mass(qp.momentum)
+    pot = qp.potential_energy
+    if pot is None:
+        pot = potential_energy(qp.position)
+    return pot + kinetic_energy_w_inv_mass(qp.momentum)
 
 
 def generate_nuts_tree(
@@ -333,18 +415,21 @@ def generate_nuts_tree(
         current_tree = current_tree._replace(diverging=new_subtree.diverging)
 
         # combine current_tree and new_subtree into a tree which is one layer deeper only if new_subtree has no turning subtrees (including itself)
-        current_tree = cond(
+        # NOTE, merging is cheap compared to building the subtree. Always
+        # merge and blend the result instead of branching via `cond` such that
+        # XLA can fuse the computation and chains do not diverge under `vmap`.
+        merged_tree = merge_trees(
+            key_merge,
+            current_tree,
+            new_subtree,
+            go_right,
+            bias_transition=bias_transition
+        )
+        current_tree = select(
             # If new tree is turning or diverging, do not merge
-            pred=new_subtree.turning | new_subtree.diverging,
-            true_fun=lambda old_and_new: old_and_new[0],
-            false_fun=lambda old_and_new: merge_trees(
-                key_merge,
-                old_and_new[0],
-                old_and_new[1],
-                go_right,
-                bias_transition=bias_transition
-            ),
-            operand=(current_tree, new_subtree),
+            new_subtree.turning | new_subtree.diverging,
+            current_tree,
+            merged_tree,
         )
         # stop if new subtree was turning -> we sample from the old one and don't expand further
         # stop if new total tree is turning -> we sample from the combined trajectory and don't expand further
@@ -495,38 +580,40 @@ def iterative_build_tree(
             max_energy_difference=max_energy_difference
         )
 
-        def _even_fun(S):
-            # n is even, the current z is w.l.o.g. a left endpoint of some
-            # subtrees. Register the current z to be used in turning condition
-            # checks later, when the right endpoints of it's subtrees are
-            # generated.
-            S = tree_index_update(S, lax.population_count(n), z)
-            return S, False
-
-        def _odd_fun(S):
-            # n is odd, the current z is w.l.o.g a right endpoint of some
-            # subtrees. Check turning condition against all left endpoints of
-            # subtrees that have the current z (/n) as their right endpoint.
-
-            # l = nubmer of subtrees that have current z as their right endpoint.
-            l = count_trailing_ones(n)
-            # inclusive indices into S referring to the left endpoints of the l subtrees.
-            i_max_incl = lax.population_count(n - 1)
-            i_min_incl = i_max_incl - l + 1
-            # TODO: this should traverse the range in reverse
-            turning = fori_loop(
-                lower=i_min_incl,
-                upper=i_max_incl + 1,
-                # TODO: conditional for early termination
-                body_fun=lambda k, turning: turning |
-                is_euclidean_uturn(tree_index_get(S, k), z),
-                init_val=False
-            )
-            return S, turning
-
-        S, turning = cond(
-            pred=n % 2 == 0, true_fun=_even_fun, false_fun=_odd_fun, operand=S
+        # NOTE, instead of branching via `cond` on the parity of n, both the
+        # store update and the turning check are computed and the results are
+        # blended. The turning check is empty for even n and the store update
+        # for odd n writes back the unaltered element.
+        is_even = n % 2 == 0
+
+        # n is even, the current z is w.l.o.g. a left endpoint of some
+        # subtrees. Register the current z to be used in turning condition
+        # checks later, when the right endpoints of it's subtrees are
+        # generated.
+        i_store = lax.population_count(n)
+        S = tree_index_update(
+            S, i_store, select(is_even, z, tree_index_get(S, i_store))
         )
+
+        # n is odd, the current z is w.l.o.g a right endpoint of some
+        # subtrees. Check turning condition against all left endpoints of
+        # subtrees that have the current z (/n) as their right endpoint.
+
+        # l = nubmer of subtrees that have current z as their right endpoint.
+        l = count_trailing_ones(n)
+        # inclusive indices into S referring to the left endpoints of the l subtrees.
+        i_max_incl = lax.population_count(n - 1)
+        i_min_incl = i_max_incl - l + 1
+        # TODO: this should traverse the range in reverse
+        turning = fori_loop(
+            lower=i_min_incl,
+            upper=i_max_incl + 1,
+            # TODO: conditional for early termination
+            body_fun=lambda k, turning: turning |
+            is_euclidean_uturn(tree_index_get(S, k), z),
+            init_val=False
+        )
+        turning = (~is_even) & turning
         incomplete_tree = incomplete_tree._replace(turning=turning)
         return (n + 1, incomplete_tree, z, S, key)
 
@@ -551,6 +638,15 @@ def iterative_build_tree(
     return incomplete_tree._replace(depth=depth)
 
 
+def _logaddexp_w_diff(x, y, diff):
+    """Stable `ln(e^x + e^y)` reusing the already computed `diff = x - y`."""
+    amax = jnp.maximum(x, y)
+    # `diff` is NaN iff `x` and `y` are infinities of the same sign
+    return jnp.where(
+        jnp.isnan(diff), x + y, amax + jnp.log1p(jnp.exp(-jnp.abs(diff)))
+    )
+
+
 def add_single_qp_to_tree(
     key, tree, qp, go_right, potential_energy, kinetic_energy,
     inverse_mass_matrix, initial_neg_energy, max_energy_difference
@@ -567,10 +663,15 @@ def add_single_qp_to_tree(
         qp, potential_energy, partial(kinetic_energy, inverse_mass_matrix)
     )
     diverging = jnp.abs(neg_energy - initial_neg_energy) > max_energy_difference
+    # Compute the difference of the log-weights once and derive both the
+    # total weight and the transition probability from it
+    logweight_diff = tree.logweight - neg_energy
     # ln(e^-H_1 + e^-H_2)
-    total_logweight = jnp.logaddexp(tree.logweight, neg_energy)
+    total_logweight = _logaddexp_w_diff(
+        tree.logweight, neg_energy, logweight_diff
+    )
     # expit(x-y) := 1 / (1 + e^(-(x-y))) = 1 / (1 + e^(y-x)) = e^x / (e^y + e^x)
-    prob_of_keeping_old = expit(tree.logweight - neg_energy)
+    prob_of_keeping_old = sigmoid(logweight_diff)
     remain = random.bernoulli(key, prob_of_keeping_old)
     proposal_candidate = select(remain, tree.proposal_candidate, qp)
     # NOTE, set an invalid depth as to indicate that adding a single QP to a
@@ -592,18 +693,15 @@ def add_single_qp_to_tree(
 
 def merge_trees(key, current_subtree, new_subtree, go_right, bias_transition):
     """Merges two trees, propagating the proposal_candidate"""
+    logweight_diff = new_subtree.logweight - current_subtree.logweight
     # 5. decide which sample to take based on total weights (merge trees)
     if bias_transition:
         # Bias the transition towards the new subtree (see Betancourt
         # conceptual intro (and Numpyro))
-        transition_probability = jnp.minimum(
-            1., jnp.exp(new_subtree.logweight - current_subtree.logweight)
-        )
+        transition_probability = jnp.minimum(1., jnp.exp(logweight_diff))
     else:
         # expit(x-y) := 1 / (1 + e^(-(x-y))) = 1 / (1 + e^(y-x)) = e^x / (e^y + e^x)
-        transition_probability = expit(
-            new_subtree.logweight - current_subtree.logweight
-        )
+        transition_probability = sigmoid(logweight_diff)
     # print(f"prob of choosing new sample: {transition_probability}")
     new_sample = select(
         random.bernoulli(key, transition_probability),
@@ -617,7 +715,9 @@ def merge_trees(key, current_subtree, new_subtree, go_right, bias_transition):
     )
     turning = is_euclidean_uturn(left, right)
     diverging = current_subtree.diverging | new_subtree.diverging
-    neg_energy = jnp.logaddexp(new_subtree.logweight, current_subtree.logweight)
+    neg_energy = _logaddexp_w_diff(
+        new_subtree.logweight, current_subtree.logweight, logweight_diff
+    )
     cum_acceptance = current_subtree.cumulative_acceptance + new_subtree.cumulative_acceptance
     merged_tree = Tree(
         left=left,
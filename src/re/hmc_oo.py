@@ -4,19 +4,28 @@ from functools import partial
 from typing import Any, Callable, NamedTuple, Optional, Tuple, Union
 
 import numpy as np
-from jax import grad
+from jax import jit, value_and_grad, vmap
 from jax import numpy as jnp
 from jax import random, tree_util
+from jax.flatten_util import ravel_pytree
 
-from .lax import fori_loop
 from .hmc import AcceptedAndRejected, Q, QP, Tree
 from .hmc import (
     generate_hmc_acc_rej,
     generate_nuts_tree,
-    leapfrog_step,
+    leapfrog_step_w_value_and_grad,
     sample_momentum_from_diagonal,
-    tree_index_update,
 )
+from .lax import _DISABLE_CONTROL_FLOW_PRIM, scan
+
+
+def _strip_gradient(qp: QP) -> QP:
+    """Drops the cached gradient from a `QP` destined for the saved chain.
+
+    The gradient is only needed to continue the trajectory and would
+    otherwise double the storage of every saved intermediate.
+    """
+    return qp._replace(potential_energy_gradient=None)
 
 
 def _parse_diag_mass_matrix(mass_matrix, position_proto: Q) -> Q:
@@ -31,9 +40,9 @@ def _parse_diag_mass_matrix(mass_matrix, position_proto: Q) -> Q:
             lambda a1, a2: jnp.shape(a1) == jnp.shape(a2), mass_matrix,
             position_proto
         )
-        shape_and_structure_match = all(
-            tree_util.tree_flatten(shape_match_tree)
-        )
+        # NOTE, `tree_flatten` returns a tuple of leaves and tree definition
+        # which is always truthy; only inspect the leaves
+        shape_and_structure_match = all(tree_util.tree_leaves(shape_match_tree))
         if not shape_and_structure_match:
             ve = "matrix has same tree_structe as the position but shapes do not match up"
             raise ValueError(ve)
@@ -79,68 +88,159 @@ class _Sampler:
         self.step_size = step_size
 
         def kinetic_energy(inverse_mass_matrix, momentum):
-            # NOTE, assume a diagonal mass-matrix
-            return inverse_mass_matrix.dot(momentum**2) / 2.
+            # NOTE, assume a diagonal mass-matrix. Flatten both trees such that
+            # the kinetic energy is a single dot product irrespective of the
+            # number of leaves instead of one reduction per leaf.
+            inv_m_flat, _ = ravel_pytree(inverse_mass_matrix)
+            momentum_flat, _ = ravel_pytree(momentum)
+            return jnp.dot(inv_m_flat, momentum_flat * momentum_flat) / 2.
 
         self.kinetic_energy = kinetic_energy
         kinetic_energy_gradient = lambda inv_m, mom: inv_m * mom
-        potential_energy_gradient = grad(self.potential_energy)
-        self.stepper = partial(
-            leapfrog_step, potential_energy_gradient, kinetic_energy_gradient
+        self.potential_energy_value_and_grad = value_and_grad(
+            self.potential_energy
+        )
+        self.stepper_w_value_and_grad = partial(
+            leapfrog_step_w_value_and_grad,
+            self.potential_energy_value_and_grad, kinetic_energy_gradient
         )
 
         self.max_energy_difference = max_energy_difference
 
-        def sample_next_state(key,
-                              prev_position: Q) -> Tuple[Any, Tuple[Any, Q]]:
+        def sample_next_state(
+            key_momentum, key_sample, prev_position: Q, prev_potential_energy,
+            prev_gradient
+        ) -> Tuple[Any, Tuple[Q, Any, Q]]:
             raise NotImplementedError()
 
         self.sample_next_state = sample_next_state
+        self._generate_n_samples_jit = None
+
+    def init_core_state(self, initial_position: Q) -> Tuple[Any, ...]:
+        """Initial state passed to `sample_next_state`. Its first entry must be
+        the position.
+
+        The potential energy and its gradient at the current position are
+        carried along from one step of the chain to the next as only the
+        momentum is resampled in-between.
+        """
+        return (
+            initial_position,
+            *self.potential_energy_value_and_grad(initial_position)
+        )
 
     @staticmethod
-    def init_chain(
-        num_samples: int, position_proto, save_intermediates: bool
-    ) -> Chain:
-        raise NotImplementedError()
+    def split_step_key(key) -> Tuple[Any, Tuple[Any, Any]]:
+        """Splits off the keys for resampling the momentum and for drawing the
+        sample of a single step of the chain."""
+        key, key_momentum, key_sample = random.split(key, 3)
+        return key, (key_momentum, key_sample)
 
     @staticmethod
-    def update_chain(
-        chain: Chain, idx: Union[jnp.ndarray, int], tree: Tree
-    ) -> Chain:
+    def chain_entry(tree, save_intermediates: bool) -> Chain:
+        """Summarizes the outcome of a single step of the chain. The entries
+        are stacked along a new leading axis to form the final chain."""
         raise NotImplementedError()
 
+    def _get_generate_n_samples(self):
+        """Returns the compiled chain, compiling it on first use.
+
+        The chain is compiled once instead of re-tracing the potential, its
+        gradient and the kinetic energy on every call to `generate_n_samples`.
+        It is re-compiled whenever an attribute of the sampler, e.g. the step
+        size, is replaced. Without control flow primitives the chain runs
+        un-jitted for debugging.
+        """
+        if _DISABLE_CONTROL_FLOW_PRIM:
+            return self._generate_n_samples
+        params = {
+            k: v
+            for k, v in vars(self).items() if k != "_generate_n_samples_jit"
+        }
+        if self._generate_n_samples_jit is not None:
+            old_params, generate = self._generate_n_samples_jit
+            if old_params.keys() == params.keys() and all(
+                old_params[k] is v for k, v in params.items()
+            ):
+                return generate
+        generate = jit(
+            self._generate_n_samples,
+            static_argnames=("num_samples", "save_intermediates")
+        )
+        self._generate_n_samples_jit = (params, generate)
+        return generate
+
+    def _generate_n_samples(
+        self, key, initial_position: Q, num_samples: int,
+        save_intermediates: bool
+    ) -> Tuple[Chain, Tuple[Any, Q]]:
+        def amend_chain(core_state, step_keys):
+            tree, core_state = self.sample_next_state(*step_keys, *core_state)
+            return core_state, self.chain_entry(tree, save_intermediates)
+
+        # Split all keys for resampling the momentum and for drawing the
+        # sample up-front instead of carrying the key through the chain. The
+        # keys are split successively, as if done step by step, such that the
+        # random stream of the chain does not depend on this choice.
+        key, step_keys = scan(
+            lambda key, _: self.split_step_key(key),
+            key,
+            None,
+            length=num_samples
+        )
+        # Let `scan` stack the entries of the chain instead of pre-allocating
+        # the chain and updating it in-place at every step
+        core_state, chain = scan(
+            amend_chain, self.init_core_state(initial_position), step_keys
+        )
+        chain = chain._replace(acceptance=jnp.mean(chain.acceptance))
+
+        position, *_ = core_state
+        return chain, (key, position)
+
     def generate_n_samples(
         self,
         key: Any,
         initial_position: Q,
         num_samples,
         *,
-        save_intermediates: bool = False
+        save_intermediates: bool = False,
+        num_chains: Optional[int] = None
     ) -> Tuple[Chain, Tuple[Any, Q]]:
+        """Draw `num_samples` samples starting from `initial_position`.
+
+        If `num_chains` is not None, that many independent chains are run
+        batched via `vmap`. All chains start at `initial_position` but use
+        different random keys. The chain, the returned keys and the final
+        positions then carry an additional leading axis of size `num_chains`.
+        """
         if not isinstance(key, (jnp.ndarray, np.ndarray)):
             if isinstance(key, int):
                 key = random.PRNGKey(key)
             else:
                 raise TypeError()
 
-        chain = self.init_chain(
-            num_samples, initial_position, save_intermediates
+        generate = partial(
+            self._get_generate_n_samples(),
+            num_samples=num_samples,
+            save_intermediates=save_intermediates
         )
+        if num_chains is None:
+            return generate(key, initial_position)
 
-        def amend_chain(idx, state):
-            chain, core_state = state
-            tree, core_state = self.sample_next_state(*core_state)
-            chain = self.update_chain(chain, idx, tree)
-            return chain, core_state
-
-        chain, core_state = fori_loop(
-            lower=0,
-            upper=num_samples,
-            body_fun=amend_chain,
-            init_val=(chain, (key, initial_position))
+        if not isinstance(num_chains, int):
+            raise TypeError()
+        keys = random.split(key, num_chains)
+        if _DISABLE_CONTROL_FLOW_PRIM:
+            # The Python fallbacks of the control flow primitives can not be
+            # traced by `vmap`; run the chains one after another instead
+            chains = [generate(k, initial_position) for k in keys]
+            return tree_util.tree_map(lambda *x: jnp.stack(x), *chains)
+        initial_positions = tree_util.tree_map(
+            lambda x: jnp.broadcast_to(x, (num_chains, ) + jnp.shape(x)),
+            initial_position
         )
-
-        return chain, core_state
+        return vmap(generate)(keys, initial_positions)
 
 
 class NUTSChain(_Sampler):
@@ -167,97 +267,61 @@ class NUTSChain(_Sampler):
         self.bias_transition = bias_transition
         self.max_tree_depth = max_tree_depth
 
-        def sample_next_state(key,
-                              prev_position: Q) -> Tuple[Tree, Tuple[Any, Q]]:
-            key, key_momentum, key_nuts = random.split(key, 3)
-
+        def sample_next_state(
+            key_momentum, key_nuts, prev_position: Q, prev_potential_energy,
+            prev_gradient
+        ) -> Tuple[Tree, Tuple[Q, Any, Q]]:
             resampled_momentum = sample_momentum_from_diagonal(
                 key=key_momentum, mass_matrix_sqrt=self.mass_matrix_sqrt
             )
-            qp = QP(position=prev_position, momentum=resampled_momentum)
+            qp = QP(
+                position=prev_position,
+                momentum=resampled_momentum,
+                potential_energy=prev_potential_energy,
+                potential_energy_gradient=prev_gradient
+            )
 
             tree = generate_nuts_tree(
                 initial_qp=qp,
                 key=key_nuts,
                 step_size=self.step_size,
                 max_tree_depth=self.max_tree_depth,
-                stepper=self.stepper,
+                stepper=self.stepper_w_value_and_grad,
                 potential_energy=self.potential_energy,
                 kinetic_energy=self.kinetic_energy,
                 inverse_mass_matrix=self.inverse_mass_matrix,
                 bias_transition=self.bias_transition,
                 max_energy_difference=self.max_energy_difference
             )
-            return tree, (key, tree.proposal_candidate.position)
-
-        self.sample_next_state = sample_next_state
-
-    @staticmethod
-    def init_chain(
-        num_samples: int, position_proto, save_intermediates: bool
-    ) -> Chain:
-        samples = tree_util.tree_map(
-            lambda arr: jnp.
-            zeros_like(arr, shape=(num_samples, ) + jnp.shape(arr)),
-            position_proto
-        )
-        depths = jnp.zeros(num_samples, dtype=jnp.uint64)
-        divergences = jnp.zeros(num_samples, dtype=bool)
-        chain = Chain(
-            samples=samples,
-            divergences=divergences,
-            acceptance=0.,
-            depths=depths
-        )
-        if save_intermediates:
-            _qp_proto = QP(position_proto, position_proto)
-            _tree_proto = Tree(
-                _qp_proto,
-                _qp_proto,
-                0.,
-                _qp_proto,
-                turning=True,
-                diverging=True,
-                depth=0,
-                cumulative_acceptance=0.
-            )
-            trees = tree_util.tree_map(
-                lambda leaf: jnp.
-                zeros_like(leaf, shape=(num_samples, ) + jnp.shape(leaf)),
-                _tree_proto
+            smpl = tree.proposal_candidate
+            return tree, (
+                smpl.position, smpl.potential_energy,
+                smpl.potential_energy_gradient
             )
-            chain = chain._replace(trees=trees)
 
-        return chain
+        self.sample_next_state = sample_next_state
 
     @staticmethod
-    def update_chain(
-        chain: Chain, idx: Union[jnp.ndarray, int], tree: Tree
-    ) -> Chain:
-        num_proposals = 2**jnp.array(tree.depth, dtype=jnp.uint64) - 1
+    def chain_entry(tree: Tree, save_intermediates: bool) -> Chain:
+        # NOTE, the depth of the final tree is never negative. Use the default
+        # integer type instead of an unsigned 64 bit integer as the latter is
+        # silently truncated (with a warning on every call) unless x64 is on.
+        depth = jnp.asarray(tree.depth, dtype=int)
+        num_proposals = 2**depth - 1
         tree_acceptance = jnp.where(
             num_proposals > 0, tree.cumulative_acceptance / num_proposals, 0.
         )
-
-        samples = tree_index_update(
-            chain.samples, idx, tree.proposal_candidate.position
-        )
-        divergences = chain.divergences.at[idx].set(tree.diverging)
-        depths = chain.depths.at[idx].set(tree.depth)
-        acceptance = (
-            chain.acceptance + (tree_acceptance - chain.acceptance) / (idx + 1)
-        )
-        chain = chain._replace(
-            samples=samples,
-            divergences=divergences,
-            acceptance=acceptance,
-            depths=depths
+        return Chain(
+            samples=tree.proposal_candidate.position,
+            divergences=tree.diverging,
+            acceptance=tree_acceptance,
+            depths=depth,
+            trees=tree._replace(
+                left=_strip_gradient(tree.left),
+                right=_strip_gradient(tree.right),
+                proposal_candidate=_strip_gradient(tree.proposal_candidate)
+            ) if save_intermediates else None
         )
-        if chain.trees is not None:
-            trees = tree_index_update(chain.trees, idx, tree)
-            chain = chain._replace(trees=trees)
-
-        return chain
 
 
 class HMCChain(_Sampler):
@@ -282,15 +346,20 @@ class HMCChain(_Sampler):
             raise TypeError()
         self.num_steps = num_steps
 
-        def sample_next_state(key,
-                              prev_position: Q) -> Tuple[Tree, Tuple[Any, Q]]:
-            key, key_choose, key_momentum_resample = random.split(key, 3)
-
+        def sample_next_state(
+            key_momentum_resample, key_choose, prev_position: Q,
+            prev_potential_energy, prev_gradient
+        ) -> Tuple[AcceptedAndRejected, Tuple[Q, Any, Q]]:
             resampled_momentum = sample_momentum_from_diagonal(
                 key=key_momentum_resample,
                 mass_matrix_sqrt=self.mass_matrix_sqrt
             )
-            qp = QP(position=prev_position, momentum=resampled_momentum)
+            qp = QP(
+                position=prev_position,
+                momentum=resampled_momentum,
+                potential_energy=prev_potential_energy,
+                potential_energy_gradient=prev_gradient
+            )
 
             acc_rej = generate_hmc_acc_rej(
                 key=key_choose,
@@ -298,57 +367,34 @@ class HMCChain(_Sampler):
                 potential_energy=self.potential_energy,
                 kinetic_energy=self.kinetic_energy,
                 inverse_mass_matrix=self.inverse_mass_matrix,
-                stepper=self.stepper,
+                stepper=self.stepper_w_value_and_grad,
                 num_steps=self.num_steps,
                 step_size=self.step_size,
                 max_energy_difference=self.max_energy_difference
             )
-            return acc_rej, (key, acc_rej.accepted_qp.position)
+            smpl = acc_rej.accepted_qp
+            return acc_rej, (
+                smpl.position, smpl.potential_energy,
+                smpl.potential_energy_gradient
+            )
 
         self.sample_next_state = sample_next_state
 
     @staticmethod
-    def init_chain(
-        num_samples: int, position_proto, save_intermediates: bool
-    ) -> Chain:
-        samples = tree_util.tree_map(
-            lambda arr: jnp.
-            zeros_like(arr, shape=(num_samples, ) + jnp.shape(arr)),
-            position_proto
-        )
-        divergences = jnp.zeros(num_samples, dtype=bool)
-        chain = Chain(samples=samples, divergences=divergences, acceptance=0.)
-        if save_intermediates:
-            _qp_proto = QP(position_proto, position_proto)
-            _acc_rej_proto = AcceptedAndRejected(
-                _qp_proto, _qp_proto, True, True
-            )
-            trees = tree_util.tree_map(
-                lambda leaf: jnp.
-                zeros_like(leaf, shape=(num_samples, ) + jnp.shape(leaf)),
-                _acc_rej_proto
-            )
-            chain = chain._replace(trees=trees)
-
-        return chain
+    def split_step_key(key) -> Tuple[Any, Tuple[Any, Any]]:
+        key, key_choose, key_momentum_resample = random.split(key, 3)
+        return key, (key_momentum_resample, key_choose)
 
     @staticmethod
-    def update_chain(
-        chain: Chain, idx: Union[jnp.ndarray, int], acc_rej: AcceptedAndRejected
+    def chain_entry(
+        acc_rej: AcceptedAndRejected, save_intermediates: bool
     ) -> Chain:
-        samples = tree_index_update(
-            chain.samples, idx, acc_rej.accepted_qp.position
+        return Chain(
+            samples=acc_rej.accepted_qp.position,
+            divergences=acc_rej.diverging,
+            acceptance=acc_rej.accepted,
+            trees=acc_rej._replace(
+                accepted_qp=_strip_gradient(acc_rej.accepted_qp),
+                rejected_qp=_strip_gradient(acc_rej.rejected_qp)
+            ) if save_intermediates else None
         )
-        divergences = chain.divergences.at[idx].set(acc_rej.diverging)
-        acceptance = (
-            chain.acceptance + (acc_rej.accepted - chain.acceptance) /
-            (idx + 1)
-        )
-        chain = chain._replace(
-            samples=samples, divergences=divergences, acceptance=acceptance
-        )
-        if chain.trees is not None:
-            trees = tree_index_update(chain.trees, idx, acc_rej)
-            chain = chain._replace(trees=trees)
-
-        return chain
@@ -1,35 +1,53 @@
 # SPDX-License-Identifier: GPL-2.0+ OR BSD-2-Clause
 
+import os
+
 from jax import lax
+from jax import numpy as jnp
+from jax import tree_util
 
-_DISABLE_CONTROL_FLOW_PRIM = False
+# NOTE, the switch is evaluated once at import time such that by default the
+# control flow primitives of JAX are used directly without any indirection.
+# Set the environment variable to disable them for debugging purposes.
+_DISABLE_CONTROL_FLOW_PRIM = os.environ.get(
+    "NIFTY_RE_DISABLE_CONTROL_FLOW_PRIM", ""
+).lower() in ("1", "true", "yes")
 
 
-def cond(pred, true_fun, false_fun, operand):
-    if _DISABLE_CONTROL_FLOW_PRIM:
-        if pred:
-            return true_fun(operand)
-        else:
-            return false_fun(operand)
+def _py_cond(pred, true_fun, false_fun, operand):
+    if pred:
+        return true_fun(operand)
     else:
-        return lax.cond(pred, true_fun, false_fun, operand)
+        return false_fun(operand)
 
 
-def while_loop(cond_fun, body_fun, init_val):
-    if _DISABLE_CONTROL_FLOW_PRIM:
-        val = init_val
-        while cond_fun(val):
-            val = body_fun(val)
-        return val
-    else:
-        return lax.while_loop(cond_fun, body_fun, init_val)
+def _py_while_loop(cond_fun, body_fun, init_val):
+    val = init_val
+    while cond_fun(val):
+        val = body_fun(val)
+    return val
 
 
-def fori_loop(lower, upper, body_fun, init_val):
-    if _DISABLE_CONTROL_FLOW_PRIM:
-        val = init_val
-        for i in range(int(lower), int(upper)):
-            val = body_fun(i, val)
-        return val
-    else:
-        return lax.fori_loop(lower, upper, body_fun, init_val)
+def _py_fori_loop(lower, upper, body_fun, init_val):
+    val = init_val
+    for i in range(int(lower), int(upper)):
+        val = body_fun(i, val)
+    return val
+
+
+def _py_scan(f, init, xs, length=None):
+    length = len(tree_util.tree_leaves(xs)[0]) if length is None else length
+    carry, ys = init, []
+    for i in range(length):
+        x = None if xs is None else tree_util.tree_map(lambda x: x[i], xs)
+        carry, y = f(carry, x)
+        ys.append(y)
+    return carry, tree_util.tree_map(lambda *y: jnp.stack(y), *ys)
+
+
+if _DISABLE_CONTROL_FLOW_PRIM:
+    cond, while_loop, fori_loop = _py_cond, _py_while_loop, _py_fori_loop
+    scan = _py_scan
+else:
+    cond, while_loop, fori_loop = lax.cond, lax.while_loop, lax.fori_loop
+    scan = lax.scan
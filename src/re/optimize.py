@@ -6,6 +6,7 @@ from typing import (
     Any, Callable, Dict, Mapping, NamedTuple, Optional, Tuple, Union
 )
 
+import jax
 from jax import lax
 from jax import numpy as jnp
 from jax.tree_util import Partial
@@ -79,7 +80,7 @@ def _prepare_vag_hessp(fun, jac, hessp,
 
             fun_and_grad = value_and_grad(fun)
         else:
-            ValueError("no function specified")
+            raise ValueError("no function specified")
 
     if hessp is None:
         from jax import grad, jvp
@@ -92,6 +93,75 @@ def _prepare_vag_hessp(fun, jac, hessp,
     return fun_and_grad, hessp
 
 
+@partial(jax.jit, static_argnames=("norm_ord", ))
+def _cg_resnorm(g, norm_ord=1):
+    """Residual norm up to which to solve the Newton system (taken from SciPy).
+
+    Computing it in one compiled function avoids dispatching the norm and each
+    of the subsequent scalar operations separately.
+    """
+    mag_g = jft_norm(g, ord=norm_ord)
+    return jnp.minimum(0.5, jnp.sqrt(mag_g)) * mag_g
+
+
+def _naive_line_search(pos, energy, g, dd, *, fun_and_grad, hessp):
+    """Step along the negative descent direction `dd` and halve the step until
+    the energy does not increase anymore.
+
+    After six unsuccessful halvings, the direction is reset to the gradient
+    scaled by its curvature. At most nine steps are tried. The search is
+    compiled as a whole such that the trial steps do not return to Python in
+    between.
+    """
+    # Pass the functions as pytrees such that the arguments bound by a
+    # `Partial`, e.g. the samples of a KL, are traced instead of baked into
+    # the program and freshly bound functions reuse the same compilation
+    if not isinstance(fun_and_grad, Partial):
+        fun_and_grad = Partial(fun_and_grad)
+    if not isinstance(hessp, Partial):
+        hessp = Partial(hessp)
+    return _naive_line_search_jit(pos, energy, g, dd, fun_and_grad, hessp)
+
+
+@jax.jit
+def _naive_line_search_jit(pos, energy, g, dd, fun_and_grad, hessp):
+    def ls_eval(ls):
+        new_pos = pos - ls["grad_scaling"] * ls["dd"]
+        new_energy, new_g = fun_and_grad(new_pos)
+        return {**ls, "pos": new_pos, "energy": new_energy, "g": new_g}
+
+    def ls_reset(ls):
+        gam = vdot(g, g)
+        curv = vdot(g, hessp(pos, g))
+        return {
+            **ls, "grad_scaling": jnp.ones_like(ls["grad_scaling"]),
+            "dd": gam / curv * g,
+            "reset": True,
+            "nhev": ls["nhev"] + 1
+        }
+
+    def ls_body_f(ls):
+        ls = {**ls, "grad_scaling": ls["grad_scaling"] / 2}
+        ls = lax.cond(ls["it"] == 5, ls_reset, lambda x: x, ls)
+        return ls_eval({**ls, "it": ls["it"] + 1})
+
+    def ls_cond_f(ls):
+        # NOTE, negate `<=` to also continue on NaN energies
+        return ~(ls["energy"] <= energy) & (ls["it"] < 8)
+
+    # The first trial step is taken outside of the loop
+    ls = ls_eval(
+        {
+            "it": 0,
+            "grad_scaling": jnp.ones_like(energy),
+            "dd": dd,
+            "reset": False,
+            "nhev": 0
+        }
+    )
+    return lax.while_loop(ls_cond_f, ls_body_f, ls)
+
+
 def newton_cg(fun=None, x0=None, *args, **kwargs):
     """Minimize a scalar-valued function using the Newton-CG algorithm."""
     if x0 is not None:
@@ -147,14 +217,13 @@ def _newton_cg(
         # potential in Newton thus live on comparable energy scales. Hence, the
         # energy in a Newton minimization can be used to set the CG energy
         # convergence criterion.
-        if old_fval and energy_reduction_factor:
+        # NOTE, check the static `energy_reduction_factor` first to not
+        # needlessly pull `old_fval` to the host
+        if energy_reduction_factor and old_fval:
             cg_absdelta = energy_reduction_factor * (old_fval - energy)
         else:
             cg_absdelta = None if absdelta is None else absdelta / 100.
-        mag_g = jft_norm(g, ord=cg_kwargs.get("norm_ord", 1))
-        cg_resnorm = jnp.minimum(
-            0.5, jnp.sqrt(mag_g)
-        ) * mag_g  # taken from SciPy
+        cg_resnorm = _cg_resnorm(g, norm_ord=cg_kwargs.get("norm_ord", 1))
         default_kwargs = {
             "absdelta": cg_absdelta,
             "resnorm": cg_resnorm,
@@ -169,32 +238,23 @@ def _newton_cg(
         if info is not None and info < 0:
             raise ValueError("conjugate gradient failed")
 
-        naive_ls_it = 0
-        dd = nat_g  # negative descent direction
-        grad_scaling = 1.
-        ls_reset = False
-        for naive_ls_it in range(9):
-            new_pos = pos - grad_scaling * dd
-            new_energy, new_g = fun_and_grad(new_pos)
-            nfev, njev = nfev + 1, njev + 1
-            if new_energy <= energy:
-                break
-
-            grad_scaling /= 2
-            if naive_ls_it == 5:
-                ls_reset = True
-                gam = float(vdot(g, g))
-                curv = float(g.dot(hessp(pos, g)))
-                nhev += 1
-                grad_scaling = 1.
-                dd = gam / curv * g
-        else:
+        ls = _naive_line_search(
+            pos, energy, g, nat_g, fun_and_grad=fun_and_grad, hessp=hessp
+        )
+        naive_ls_it = int(ls["it"])
+        nfev, njev = nfev + naive_ls_it + 1, njev + naive_ls_it + 1
+        nhev += int(ls["nhev"])
+        if not ls["energy"] <= energy:
             grad_scaling = 0.
             nm = "N" if name is None else name
             msg = f"{nm}: WARNING: Energy would increase; aborting"
             logger.warning(msg)
             status = -1
             break
+        dd = ls["dd"]  # negative descent direction
+        grad_scaling = float(ls["grad_scaling"])
+        ls_reset = bool(ls["reset"])
+        new_pos, new_energy, new_g = ls["pos"], ls["energy"], ls["g"]
 
         energy_diff = energy - new_energy
         old_fval = energy
@@ -240,6 +300,199 @@ def _newton_cg(
     )
 
 
+class _NewtonState(NamedTuple):
+    x: Any
+    converged: Union[bool, jnp.ndarray]
+    status: Union[int, jnp.ndarray]
+    fun: Any
+    jac: Any
+    old_fval: Union[float, jnp.ndarray]
+    grad_scaling: Union[float, jnp.ndarray]
+    naive_ls_it: Union[int, jnp.ndarray]
+    nfev: Union[int, jnp.ndarray]
+    njev: Union[int, jnp.ndarray]
+    nhev: Union[int, jnp.ndarray]
+    nit: Union[int, jnp.ndarray]
+
+
+def _static_newton_cg(
+    fun=None,
+    x0=None,
+    *,
+    miniter=None,
+    maxiter=None,
+    energy_reduction_factor=0.1,
+    old_fval=jnp.nan,
+    absdelta=None,
+    norm_ord=None,
+    xtol=1e-5,
+    jac: Optional[Callable] = None,
+    fun_and_grad=None,
+    hessp=None,
+    name=None,
+    cg=conjugate_gradient._static_cg,
+    cg_kwargs=None,
+    custom_gradnorm=None,
+) -> OptimizeResults:
+    """Newton-CG with the iteration expressed as a `lax.while_loop`.
+
+    Contrary to `_newton_cg`, the whole minimization including the naive line
+    search is traced once and compiled to a single XLA program. The `status`
+    follows the convention of `_newton_cg`: `0` for convergence, the number of
+    iterations if the iteration limit was reached and `-1` if the energy would
+    increase. Errors can not be raised from within the loop; a failed CG and
+    NaN energies are reported as `-1` as well.
+    """
+    from jax.experimental.host_callback import call
+
+    norm_ord = 1 if norm_ord is None else norm_ord
+    miniter = 0 if miniter is None else miniter
+    maxiter = 200 if maxiter is None else maxiter
+    xtol = xtol * size(x0)
+
+    fun_and_grad, hessp = _prepare_vag_hessp(
+        fun, jac, hessp, fun_and_grad=fun_and_grad
+    )
+    cg_kwargs = {} if cg_kwargs is None else cg_kwargs
+    cg_name = name + "CG" if name is not None else None
+
+    gradnorm = (
+        partial(jft_norm, ord=norm_ord)
+        if custom_gradnorm is None else custom_gradnorm
+    )
+    energy, g = fun_and_grad(x0)
+    status = jnp.where(jnp.isnan(energy), -1, 0)
+    init_params = _NewtonState(
+        x=x0,
+        converged=False,
+        status=status,
+        fun=energy,
+        jac=g,
+        old_fval=old_fval,
+        grad_scaling=1.,
+        naive_ls_it=0,
+        nfev=1,
+        njev=1,
+        nhev=0,
+        nit=0
+    )
+
+    def pp(arg):
+        msg = (
+            "{name}: →:{grad_scaling} ↺:{ls_reset} #∇²:{nhev:02d}"
+            " |↘|:{descent_norm:.6e} ➽:{xtol:.6e}"
+            "\n{name}: Iteration {i} ⛰:{energy:+.6e} Δ⛰:{energy_diff:.6e}" +
+            (" ➽:{absdelta:.6e}" if absdelta is not None else "") +
+            ("\n{name}: Iteration Limit Reached" if arg["i"] == maxiter else "")
+        )
+        logger.info(msg.format(name=name, **arg))
+
+    def _newton_body_f(params: _NewtonState) -> _NewtonState:
+        pos, energy, g = params.x, params.fun, params.jac
+        i = params.nit + 1
+
+        # See `_newton_cg` for why the energy difference of the previous
+        # iteration is a sensible CG convergence criterion
+        cg_absdelta = jnp.nan if absdelta is None else absdelta / 100.
+        if energy_reduction_factor:
+            cg_absdelta = jnp.where(
+                jnp.isnan(params.old_fval), cg_absdelta,
+                energy_reduction_factor * (params.old_fval - energy)
+            )
+        cg_resnorm = _cg_resnorm(g, norm_ord=cg_kwargs.get("norm_ord", 1))
+        default_kwargs = {
+            "absdelta": cg_absdelta,
+            "resnorm": cg_resnorm,
+            "norm_ord": 1,
+            "_raise_nonposdef": False,  # handle non-pos-def
+            "name": cg_name,
+        }
+        cg_res = cg(Partial(hessp, pos), g, **{**default_kwargs, **cg_kwargs})
+        nat_g = cg_res.x
+        cg_failed = cg_res.info < 0 if cg_res.info is not None else False
+
+        ls = _naive_line_search(
+            pos, energy, g, nat_g, fun_and_grad=fun_and_grad, hessp=hessp
+        )
+        naive_ls_it = ls["it"]
+        ls_failed = ~(ls["energy"] <= energy)
+
+        failed = cg_failed | ls_failed
+        grad_scaling = jnp.where(failed, 0., ls["grad_scaling"])
+        new_pos, new_energy, new_g = where(
+            failed, (pos, energy, g), (ls["pos"], ls["energy"], ls["g"])
+        )
+        energy_diff = energy - new_energy
+        descent_norm = grad_scaling * gradnorm(ls["dd"])
+
+        converged = (descent_norm <= xtol) & (i > miniter)
+        if absdelta is not None:
+            min_cond = (naive_ls_it < 2) & (i > miniter)
+            converged |= (0. <= energy_diff) & (energy_diff
+                                                < absdelta) & min_cond
+        converged &= ~failed
+        status = jnp.where(failed | jnp.isnan(new_energy), -1, params.status)
+        status = jnp.where(
+            (i >= maxiter) & ~converged & (status == 0), i, status
+        )
+        params = _NewtonState(
+            x=new_pos,
+            converged=converged,
+            status=status,
+            fun=new_energy,
+            jac=new_g,
+            old_fval=energy,
+            grad_scaling=grad_scaling,
+            naive_ls_it=naive_ls_it,
+            nfev=params.nfev + naive_ls_it + 1,
+            njev=params.njev + naive_ls_it + 1,
+            nhev=params.nhev + cg_res.nfev + ls["nhev"],
+            nit=i
+        )
+        if name is not None:
+            printable_state = {
+                "i": i,
+                "energy": new_energy,
+                "energy_diff": energy_diff,
+                "maxiter": maxiter,
+                "absdelta": absdelta,
+                "xtol": xtol,
+                "grad_scaling": grad_scaling,
+                "ls_reset": ls["reset"],
+                "descent_norm": descent_norm,
+                "nhev": params.nhev
+            }
+            call(pp, printable_state, result_shape=None)
+        return params
+
+    def _newton_cond_f(params: _NewtonState) -> bool:
+        return jnp.logical_not(params.converged) & (params.status == 0) & (
+            params.nit < maxiter
+        )
+
+    state = lax.while_loop(_newton_cond_f, _newton_body_f, init_params)
+
+    return OptimizeResults(
+        success=state.status >= 0,
+        nit=state.nit,
+        x=state.x,
+        fun=state.fun,
+        jac=state.jac,
+        nfev=state.nfev,
+        njev=state.njev,
+        nhev=state.nhev,
+        status=state.status
+    )
+
+
+def static_newton_cg(fun=None, x0=None, *args, **kwargs):
+    """Minimize a scalar-valued function using the Newton-CG algorithm with
+    the whole minimization being traced and compiled by JAX."""
+    if x0 is not None:
+        assert_arithmetics(x0)
+    return _static_newton_cg(fun, x0, *args, **kwargs).x
+
+
 class _TrustRegionState(NamedTuple):
     x: Any
     converged: Union[bool, jnp.ndarray]
@@ -367,19 +620,22 @@ def _trust_ncg(
 
         # update the trust radius according to the actual/predicted ratio
         rho = actual_reduction / pred_reduction
-        tr_kp1 = jnp.where(rho < 0.25, tr * 0.25, tr)
-        tr_kp1 = jnp.where(
-            (rho > 0.75) & sub_result.hits_boundary,
-            jnp.minimum(2. * tr, max_trust_radius), tr_kp1
+        tr_kp1 = jnp.select(
+            [rho < 0.25, (rho > 0.75) & sub_result.hits_boundary],
+            [tr * 0.25, jnp.minimum(2. * tr, max_trust_radius)], tr
         )
 
-        # compute norm to check for convergence
-        g_kp1_mag = jft_norm(g_kp1, ord=subproblem_kwargs.get("norm_ord", 1))
-
         # if the ratio is high enough then accept the proposed step
-        f_kp1, x_kp1, g_kp1, g_kp1_mag = where(
-            rho > eta, (f_kp1, x_kp1, g_kp1, g_kp1_mag),
-            (f_k, x_k, g_k, g_k_mag)
+        accept = rho > eta
+        f_kp1, x_kp1, g_kp1 = where(
+            accept, (f_kp1, x_kp1, g_kp1), (f_k, x_k, g_k)
+        )
+        # compute norm to check for convergence; only reduce the gradient if
+        # the step was accepted as it is unchanged otherwise
+        g_kp1_mag = lax.cond(
+            accept,
+            partial(jft_norm, ord=subproblem_kwargs.get("norm_ord", 1)),
+            lambda _: g_k_mag, g_kp1
         )
 
         # Check whether we arrived at the float precision
@@ -478,6 +734,8 @@ def minimize(
 
     if method.lower() in ('newton-cg', 'newtoncg', 'ncg'):
         return _newton_cg(fun_with_args, x0, **options)
+    elif method.lower() in ('static-newton-cg', 'static-ncg'):
+        return _static_newton_cg(fun_with_args, x0, **options)
     elif method.lower() in ('trust-ncg', 'trustncg'):
         return _trust_ncg(fun_with_args, x0, **options)
 
@@ -395,7 +395,9 @@ def makeDomain(domain):
     DomainTuple or MultiDomain
         The newly created domain object
     """
-    if isinstance(domain, (MultiDomain, dict)):
+    if isinstance(domain, (DomainTuple, MultiDomain)):
+        return domain
+    if isinstance(domain, dict):
         return MultiDomain.make(domain)
     return DomainTuple.make(domain)
 
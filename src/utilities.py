@@ -515,3 +515,7 @@ class Nop:
         return Nop()
     def __getattr__(self, _):
         return self.nop
+    def __getitem__(self, _):
+        return Nop()
+    def __setitem__(self, _, __):
+        pass
@@ -70,6 +70,22 @@ def test_power_synthesize_analyze(space1, space2):
     assert_allclose(sc2.mean.val, fp2.val, rtol=0.2)
 
 
+def test_StatCalculator_merge():
+    dom = ift.RGSpace(10)
+    flds = [ift.from_random(dom) for _ in range(7)]
+    sc_full, merged = ift.StatCalculator(), ift.StatCalculator()
+    for ff in flds:
+        sc_full.add(ff)
+    for part in (flds[:3], [], flds[3:4], flds[4:]):
+        sc = ift.StatCalculator()
+        for ff in part:
+            sc.add(ff)
+        merged.merge(sc)
+    assert merged.count == sc_full.count == len(flds)
+    assert_allclose(merged.mean.val, sc_full.mean.val)
+    assert_allclose(merged.var.val, sc_full.var.val)
+
+
 @pmp('space1', [
     ift.RGSpace((8,), harmonic=True),
     ift.RGSpace((8, 8), harmonic=True, distances=0.123)
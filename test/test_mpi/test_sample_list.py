@@ -15,6 +15,7 @@
 # Author: Philipp Arras
 
 import nifty8 as ift
+import numpy as np
 import pytest
 from mpi4py import MPI
 
@@ -131,7 +132,8 @@ def test_load_mean(comm):
 @pmp("mean", [False, True])
 @pmp("std", [False, True])
 @pmp("samples", [False, True])
-def test_save_to_hdf5(comm, cls, mean, std, samples):
+@pmp("compression", [None, "gzip"])
+def test_save_to_hdf5(comm, cls, mean, std, samples, compression):
     pytest.importorskip("h5py")
     import h5py
     from nifty8 import DomainTuple, MultiDomain, RGSpace, UnstructuredDomain
@@ -146,7 +148,8 @@ def test_save_to_hdf5(comm, cls, mean, std, samples):
             with pytest.raises(ValueError):
                 sl.save_to_hdf5("output.h5", op, mean=mean, std=std, samples=samples)
             continue
-        sl.save_to_hdf5("output.h5", op, mean=mean, std=std, samples=samples, overwrite=True)
+        sl.save_to_hdf5("output.h5", op, mean=mean, std=std, samples=samples, overwrite=True,
+                        compression=compression)
         if comm is not None:
             comm.Barrier()
 
@@ -171,6 +174,42 @@ def test_save_to_hdf5(comm, cls, mean, std, samples):
         f.close()
 
 
+@pmp("cls", all_cls)
+def test_save_to_hdf5_parallel(cls):
+    h5py = pytest.importorskip("h5py")
+    if not h5py.get_config().mpi:
+        pytest.skip("h5py has been built without MPI support")
+
+    comm = MPI.COMM_WORLD
+    sl, _ = _get_sample_list(comm, cls)
+    std = sl.n_samples > 1
+    for op in _get_ops(sl):
+        sl.save_to_hdf5("output.h5", op, samples=True, mean=True, std=std, overwrite=True)
+        comm.Barrier()
+
+        ref = list(sl.iterator(op))
+        if std:
+            ref_mean, ref_var = sl.sample_stat(op)
+        else:
+            ref_mean = sl.average(op)
+        if comm.Get_rank() == 0:
+            with h5py.File("output.h5", "r") as f:
+                for ii, rr in enumerate(ref):
+                    _assert_hdf5_equal(f["samples"][str(ii)], rr)
+                _assert_hdf5_equal(f["stats"]["mean"], ref_mean)
+                if std:
+                    _assert_hdf5_equal(f["stats"]["standard deviation"], ref_var.sqrt())
+        comm.Barrier()
+
+
+def _assert_hdf5_equal(inp, fld):
+    if isinstance(fld, ift.MultiField):
+        for kk, vv in fld.items():
+            _assert_hdf5_equal(inp[kk], vv)
+        return
+    np.testing.assert_allclose(inp[()], fld.val)
+
+
 def _get_shape(inp, mdom):
     if not mdom:
         return inp.shape
@@ -333,6 +333,19 @@ def testPartialExtractor(seed):
         ift.extra.check_linear_operator(op)
 
 
+@pmp('seed', [12, 3])
+def testPrependKey(seed):
+    with ift.random.Context(seed):
+        dom = ift.MultiDomain.make({'a': ift.RGSpace(1), 'ab': ift.RGSpace(2),
+                                    'b': ift.RGSpace(3)})
+        op = ift.PrependKey(dom, 'pre_')
+        ift.extra.check_linear_operator(op)
+        fld = ift.from_random(dom)
+        res = op(fld)
+        for kk in dom.keys():
+            ift.extra.assert_equal(res['pre_'+kk], fld[kk])
+
+
 @pmp('seed', [12, 3])
 def testSlowFieldAdapter(seed):
     dom = {'a': ift.RGSpace(1), 'b': ift.RGSpace(2)}
@@ -203,3 +203,36 @@ def test_build_nufft(space, N, eps):
     # We set rtol=eps here, because the gridder operator only guarantees
     # adjointness to this accuracy.
     ift.extra.check_linear_operator(RF, cmplx, flt, only_r_linear=True, rtol=eps)
+
+
+@pmp('eps', [1e-2, 1e-5])
+@pmp('space', [ift.RGSpace(128),
+               ift.RGSpace([32, 64]),
+               ift.RGSpace([10, 27, 32])])
+@pmp('N', [1, 10, 100])
+def test_nufft_single_precision(space, N, eps):
+    pos = ift.random.current_rng().random((N, len(space.shape))) - 0.5
+    RF = ift.Nufft(space, pos=pos, eps=eps, nthreads=2, single_precision=True)
+    RF64 = ift.Nufft(space, pos=pos, eps=eps)
+    vis = (ift.random.current_rng().standard_normal(N)
+           + 1j*ift.random.current_rng().standard_normal(N))
+    vis = ift.makeField(RF.domain, vis)
+    res = RF(vis).val
+    ift.myassert(res.dtype == np.float32)
+    ift.myassert(_l2error(RF64(vis).val, res) < eps*10)
+    with pytest.raises(ValueError):
+        ift.Nufft(space, pos=pos, eps=1e-7, single_precision=True)
+
+
+def test_nufft_pickle():
+    from pickle import dumps, loads
+
+    space = ift.RGSpace([32, 64])
+    pos = ift.random.current_rng().random((10, 2)) - 0.5
+    RF = ift.Nufft(space, pos=pos, eps=1e-5)
+    vis = (ift.random.current_rng().standard_normal(10)
+           + 1j*ift.random.current_rng().standard_normal(10))
+    vis = ift.makeField(RF.domain, vis)
+    res = RF(vis).val
+    RF2 = loads(dumps(RF))
+    np.testing.assert_allclose(RF2(vis).val, res)
@@ -5,8 +5,9 @@ pytest.importorskip("jax")
 from functools import partial
 
 from jax import numpy as jnp
+from jax import random
 from jax.tree_util import tree_leaves
-from numpy.testing import assert_array_equal
+from numpy.testing import assert_allclose, assert_array_equal
 
 import nifty8.re as jft
 
@@ -75,6 +76,140 @@ def test_nuts_pytree():
         assert_array_equal(w, wo)
 
 
+@pytest.mark.parametrize("sampler_cls, kwargs", (
+    (jft.HMCChain, dict(num_steps=10)),
+    (jft.NUTSChain, dict(max_tree_depth=5)),
+))
+def test_multiple_chains(sampler_cls, kwargs):
+    initial_position = jnp.array([0.31415, 2.71828])
+    sampler = sampler_cls(
+        potential_energy=lambda x: jft.vdot(x, x),
+        inverse_mass_matrix=1.,
+        position_proto=initial_position,
+        step_size=0.193,
+        **kwargs
+    )
+
+    n_chains, n_samples = 3, 50
+    key = random.PRNGKey(42)
+    chains, (keys, pos) = sampler.generate_n_samples(
+        key, initial_position, num_samples=n_samples, num_chains=n_chains
+    )
+    assert chains.samples.shape == (n_chains, n_samples, 2)
+    assert chains.acceptance.shape == (n_chains, )
+    assert pos.shape == (n_chains, 2)
+
+    for i, k in enumerate(random.split(key, n_chains)):
+        chain, (k, p) = sampler.generate_n_samples(
+            k, initial_position, num_samples=n_samples
+        )
+        assert_array_equal(k, keys[i])
+        assert_allclose(chain.samples, chains.samples[i], rtol=1e-5, atol=1e-6)
+        assert_allclose(p, pos[i], rtol=1e-5, atol=1e-6)
+
+
+def test_multiple_chains_without_control_flow_prim():
+    # The switch is read at import time; run the chains in a fresh process
+    import os
+    import subprocess
+    import sys
+    from textwrap import dedent
+
+    script = dedent(
+        """
+        from jax import numpy as jnp
+        import nifty8.re as jft
+
+        x0 = jnp.array([0.31415, 2.71828])
+        for cls, kw in ((jft.HMCChain, {"num_steps": 3}),
+                        (jft.NUTSChain, {"max_tree_depth": 3})):
+            sampler = cls(
+                potential_energy=lambda x: jft.vdot(x, x),
+                inverse_mass_matrix=1.,
+                position_proto=x0,
+                step_size=0.193,
+                **kw
+            )
+            chains, (keys, pos) = sampler.generate_n_samples(
+                42, x0, num_samples=4, num_chains=2
+            )
+            assert chains.samples.shape == (2, 4, 2)
+            assert chains.acceptance.shape == (2, )
+            assert pos.shape == (2, 2)
+        """
+    )
+    env = {**os.environ, "NIFTY_RE_DISABLE_CONTROL_FLOW_PRIM": "1"}
+    res = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True
+    )
+    assert res.returncode == 0, res.stderr
+
+
+@pytest.mark.parametrize("sampler_cls, kwargs", (
+    (jft.HMCChain, dict(num_steps=10)),
+    (jft.NUTSChain, dict(max_tree_depth=5)),
+))
+def test_saved_trees_without_gradient(sampler_cls, kwargs):
+    initial_position = jnp.array([0.31415, 2.71828])
+    sampler = sampler_cls(
+        potential_energy=lambda x: jft.vdot(x, x),
+        inverse_mass_matrix=1.,
+        position_proto=initial_position,
+        step_size=0.193,
+        **kwargs
+    )
+
+    n_samples = 20
+    chain, _ = sampler.generate_n_samples(
+        42, initial_position, num_samples=n_samples, save_intermediates=True
+    )
+    for qp in chain.trees:
+        if isinstance(qp, jft.hmc.QP):
+            assert qp.potential_energy_gradient is None
+    # Only the position, the momentum and the potential energy of each
+    # saved `QP` are kept per sample
+    n_qps = sum(isinstance(qp, jft.hmc.QP) for qp in chain.trees)
+    n_leaves = sum(l.size for l in tree_leaves(chain.trees))
+    n_other = len(chain.trees) - n_qps
+    assert n_leaves == n_samples * (n_qps * (2 * 2 + 1) + n_other)
+
+
+def test_mass_matrix_shape_mismatch():
+    position_proto = {"a": jnp.zeros(3), "b": jnp.zeros(2)}
+    inverse_mass_matrix = {"a": jnp.ones(3), "b": jnp.ones(4)}
+    with pytest.raises(ValueError):
+        jft.HMCChain(
+            potential_energy=lambda x: jft.vdot(x, x),
+            inverse_mass_matrix=inverse_mass_matrix,
+            position_proto=position_proto,
+            num_steps=10
+        )
+
+
+def test_hmc_step_size_update():
+    initial_position = jnp.array([0.31415, 2.71828])
+    sampler_init = partial(
+        jft.HMCChain,
+        potential_energy=lambda x: jft.vdot(x, x),
+        inverse_mass_matrix=1.,
+        position_proto=initial_position,
+        num_steps=10
+    )
+
+    sampler = sampler_init(step_size=0.193)
+    sampler.generate_n_samples(
+        key=321, initial_position=initial_position, num_samples=10
+    )
+    sampler.step_size = 0.05
+    smpl_updated, _ = sampler.generate_n_samples(
+        key=321, initial_position=initial_position, num_samples=10
+    )
+    smpl_fresh, _ = sampler_init(step_size=0.05).generate_n_samples(
+        key=321, initial_position=initial_position, num_samples=10
+    )
+    assert_array_equal(smpl_updated.samples, smpl_fresh.samples)
+
+
 if __name__ == "__main__":
     test_hmc_pytree()
     test_nuts_pytree()
@@ -48,7 +48,8 @@ def eggholder(np):
     return func
 
 
-def test_ncg_for_pytree():
+@pmp("ncg", (jft.newton_cg, jft.static_newton_cg))
+def test_ncg_for_pytree(ncg):
     pos = jft.Vector(
         [
             jnp.array(0., dtype=jnp.float32),
@@ -74,7 +75,7 @@ def test_ncg_for_pytree():
         m.append({"a": tan[2]["a"] * met[2]})
         return jft.Vector(m)
 
-    res = jft.newton_cg(
+    res = ncg(
         fun_and_grad=value_and_grad(model),
         x0=pos,
         hessp=metric,
@@ -86,7 +87,8 @@ def test_ncg_for_pytree():
 
 
 @pmp("seed", (3637, 12, 42))
-def test_ncg(seed):
+@pmp("ncg", (jft.newton_cg, jft.static_newton_cg))
+def test_ncg(seed, ncg):
     key = random.PRNGKey(seed)
     x = random.normal(key, shape=(3, ))
     diag = jnp.array([1., 2., 3.])
@@ -95,7 +97,7 @@ def test_ncg(seed):
         jnp.sum(y**2 / diag) / 2 - jnp.dot(x, y), y / diag - x
     )
 
-    res = jft.newton_cg(
+    res = ncg(
         fun_and_grad=val_and_grad,
         x0=x,
         hessp=met,
@@ -106,6 +108,27 @@ def test_ncg(seed):
     assert_allclose(res, diag * x, rtol=1e-4, atol=1e-4)
 
 
+@pmp(
+    "ncg", (jft.optimize._newton_cg, jft.optimize._static_newton_cg)
+)
+def test_ncg_indefinite_hessian(ncg):
+    val_and_grad = value_and_grad(
+        lambda y: jnp.sum(y[0]**2 - y[1]**2 + 0.1 * y[1]**4)
+    )
+    hessp = lambda y, t: jnp.array([2. * t[0], (1.2 * y[1]**2 - 2.) * t[1]])
+
+    res = ncg(
+        fun_and_grad=val_and_grad,
+        x0=jnp.array([1., 0.3]),
+        hessp=hessp,
+        maxiter=20,
+        absdelta=1e-6
+    )
+    assert res.status == 0
+    assert res.success
+    assert_allclose(res.x, [0., jnp.sqrt(5.)], rtol=1e-4, atol=1e-4)
+
+
 @pmp("seed", (3637, 12, 42))
 @pmp("cg", (jft.cg, jft.static_cg))
 def test_cg(seed, cg):
@@ -120,6 +143,21 @@ def test_cg(seed, cg):
     assert_allclose(res, diag * x, rtol=1e-4, atol=1e-4)
 
 
+@pmp("seed", (3637, 12, 42))
+def test_cg_dtype_matvec(seed):
+    key = random.PRNGKey(seed)
+    sk = random.split(key, 2)
+    x = random.normal(sk[0], shape=(3, ))
+    diag = 6. + random.normal(sk[1], shape=(3, ))
+    mat = lambda x: x / diag
+
+    res, _ = jft.cg(
+        mat, x, resnorm=1e-5, absdelta=1e-5, dtype_matvec=jnp.bfloat16
+    )
+    assert res.dtype == x.dtype
+    assert_allclose(res, diag * x, rtol=1e-2, atol=1e-2)
+
+
 @pmp("seed", (3637, 12, 42))
 @pmp("cg", (jft.cg, jft.static_cg))
 def test_cg_non_pos_def_failure(seed, cg):
@@ -234,4 +272,4 @@ def test_minimize(fun_and_init, maxiter):
 
 
 if __name__ == "__main__":
-    test_ncg_for_pytree()
+    test_ncg_for_pytree(jft.newton_cg)